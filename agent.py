@@ -1,18 +1,26 @@
 # planet_pattern/agent.py
 import numpy as np
 
+from noise_stream import NoiseStream, spawn_seeds
+
 
 class PlanetAgent:
     """
     Простой «агент-резонатор».
     У него есть внутренний параметр alpha — насколько он следует целевой волне 0.1 Гц.
     Обучение: если резонанс ↑ — чуть увеличиваем alpha; если ↓ — уменьшаем.
+    Шум — из собственного NoiseStream агента (seed или готовый поток noise).
     """
-    def __init__(self, name, alpha=0.5, lr=0.1, adaptive=True):
+    def __init__(self, name, alpha=0.5, lr=0.1, adaptive=True, seed=None, noise=None):
         self.name = name
         self.alpha = float(alpha)
         self.lr = float(lr)
         self.adaptive = adaptive  # True = живой агент, False = фиксированный
+        self.noise = noise if noise is not None else NoiseStream(seed)
+
+    def reseed(self, seed):
+        """Новый поток шума из seed (int или SeedSequence)."""
+        self.noise = NoiseStream(seed, block=self.noise.block)
 
     def act(self, phase, local_progress, noise_scale=0.2):
         """
@@ -23,7 +31,7 @@ class PlanetAgent:
         """
         # идеальный ритм задаём синусом от прогресса фазы (0..1)
         ideal = np.sin(2*np.pi*local_progress)
-        noise = np.random.normal(0, noise_scale)
+        noise = self.noise.normal(0, noise_scale)
         y = self.alpha * ideal + (1 - self.alpha) * noise
         return float(y)
 
@@ -55,5 +63,133 @@ class FixedAgent(PlanetAgent):
     """
     Фиксированный агент для сравнения (механический, не живой).
     """
-    def __init__(self, name, alpha=0.5):
-        super().__init__(name, alpha=alpha, lr=0.0, adaptive=False)
+    def __init__(self, name, alpha=0.5, seed=None, noise=None):
+        super().__init__(name, alpha=alpha, lr=0.0, adaptive=False, seed=seed, noise=noise)
+
+
+class AgentPopulation:
+    """
+    Популяция агентов в виде «структуры массивов»: alpha, lr и флаг adaptive
+    хранятся в непрерывных массивах длины N, act/learn — маскированные векторные операции.
+    Живые и фиксированные (как FixedAgent) агенты живут в одной популяции.
+
+    Шум — матрица (rows, N), доливаемая раз в rows шагов. Источники шума:
+    - по умолчанию агенты нарезаны на полосы по lane агентов, у каждой полосы свой
+      NoiseStream (дочерний SeedSequence от seed) и одна выборка (rows, lane) на долив.
+      Шум агента определяется seed, N и номером агента — не зависит от block и от того,
+      сколько шагов делается за вызов. Память на шум ~ 2·max_noise_elems чисел при любом N;
+    - streams — явные потоки по одному на агента (from_agents): агент i получает ровно
+      тот же сигнал и alpha, что и скалярный PlanetAgent с тем же потоком.
+    """
+    def __init__(self, n, alpha=0.5, lr=0.1, adaptive=True, names=None, seed=None, streams=None,
+                 block=256, lane=1024, max_noise_elems=1 << 22):
+        self.n = int(n)
+        self.alpha = np.array(np.broadcast_to(alpha, (self.n,)), dtype=float)
+        self.lr = np.array(np.broadcast_to(lr, (self.n,)), dtype=float)
+        self.adaptive = np.array(np.broadcast_to(adaptive, (self.n,)), dtype=bool)
+        self.names = list(names) if names is not None else None
+        # шагов шума на долив: не больше block и не больше max_noise_elems чисел на всю популяцию
+        self.block = max(1, min(int(block), int(max_noise_elems) // max(self.n, 1)))
+        if streams is not None:
+            if len(streams) != self.n:
+                raise ValueError(f"AgentPopulation: {len(streams)} потоков шума на {self.n} агентов")
+            self.streams = list(streams)
+            self.widths = [1] * self.n
+        else:
+            self.widths = [min(lane, self.n - lo) for lo in range(0, self.n, lane)]
+            self.streams = [NoiseStream(s, block=self.block * w)
+                            for s, w in zip(spawn_seeds(seed, len(self.widths)), self.widths)]
+        self._bounds = np.concatenate([[0], np.cumsum(self.widths)]).astype(int)
+        self._noise = np.empty((0, self.n))
+        self._row = 0
+
+    @classmethod
+    def from_agents(cls, agents, block=256):
+        """Собирает популяцию из списка PlanetAgent / FixedAgent (потоки шума общие с агентами)."""
+        agents = list(agents)
+        return cls(
+            len(agents),
+            alpha=[a.alpha for a in agents],
+            lr=[a.lr for a in agents],
+            adaptive=[a.adaptive for a in agents],
+            names=[a.name for a in agents],
+            streams=[a.noise for a in agents],
+            block=block,
+        )
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def per_agent_streams(self):
+        return all(w == 1 for w in self.widths) and len(self.streams) == self.n
+
+    def to_agents(self):
+        """
+        Обратное преобразование в скалярные агенты (для отладки и сравнения).
+        Шум продолжается точно только для популяций с потоками на агента (from_agents);
+        при полосах агенты получают свежие потоки.
+        """
+        names = self.names or [f"agent{i}" for i in range(self.n)]
+        if self.per_agent_streams:
+            noises = [NoiseStream.from_state(state) for state in self.noise_state()]
+        else:
+            noises = [None] * self.n
+        return [PlanetAgent(names[i], alpha=self.alpha[i], lr=self.lr[i], adaptive=bool(self.adaptive[i]),
+                            noise=noises[i])
+                for i in range(self.n)]
+
+    def noise_state(self):
+        """Состояния потоков шума (по агентам или по полосам) без учёта ещё не использованных шагов."""
+        unused = self._noise.shape[0] - self._row
+        return [stream.state(rewind=unused * w) for stream, w in zip(self.streams, self.widths)]
+
+    def set_noise_state(self, states):
+        for stream, state in zip(self.streams, states):
+            stream.set_state(state)
+        self._noise = np.empty((0, self.n))
+        self._row = 0
+
+    def _noise_row(self):
+        if self._row >= self._noise.shape[0]:
+            rows = self.block
+            if self._noise.shape[0] != rows:
+                self._noise = np.empty((rows, self.n))
+            for stream, w, lo in zip(self.streams, self.widths, self._bounds):
+                self._noise[:, lo:lo + w] = stream.draw(rows * w).reshape(rows, w)
+            self._row = 0
+        z = self._noise[self._row]
+        self._row += 1
+        return z
+
+    def act(self, phase, local_progress, noise_scale=0.2, out=None):
+        """
+        Сигналы всех N агентов за один шаг.
+        local_progress — скаляр (общий ритм) или массив формы (N,).
+        """
+        ideal = np.sin(2*np.pi*local_progress)
+        noise = noise_scale * self._noise_row()
+        # y = alpha * ideal + (1 - alpha) * noise — без лишних временных массивов
+        y = np.multiply(self.alpha, ideal, out=out)
+        w = 1.0 - self.alpha
+        w *= noise
+        y += w
+        return y
+    def learn(self, last_score, target=70.0):
+        """
+        Векторная версия PlanetAgent.learn: last_score и target — скаляры или массивы (N,).
+        Фиксированные агенты (adaptive=False) не меняются.
+        """
+        score = np.broadcast_to(np.asarray(last_score, dtype=float), (self.n,))
+        target = np.broadcast_to(np.asarray(target, dtype=float), (self.n,))
+        gap = (score - target) / 100.0
+
+        # Если score близок к target или выше → поощряем alpha
+        gap = np.where(score >= target * 0.8, np.abs(gap) * 0.5, gap)
+        step = self.lr * gap
+        # Плавное восстановление после провала: фиксированный шаг +0.02
+        step[score < target / 2] = 0.02
+
+        new_alpha = self.alpha + step
+        np.clip(new_alpha, 0.1, 1.0, out=new_alpha)
+        np.copyto(self.alpha, new_alpha, where=self.adaptive)
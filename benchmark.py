@@ -0,0 +1,295 @@
+# planet_pattern/benchmark.py
+"""
+Бенчмарки горячих путей Planet Pattern с базовой линией для регрессий.
+
+    python benchmark.py                               # все случаи + сравнение с bench_baseline.json
+    python benchmark.py --quick --only coherence      # малая сетка, фильтр по имени
+    python benchmark.py --baseline other.json --threshold 0.25
+    python benchmark.py --no-compare                  # только замер, без сравнения
+
+Базовая линия bench_baseline.json лежит в репозитории (полная сетка, снята этим же
+скриптом). Перегенерировать — после намеренного изменения скорости или на новой
+эталонной машине — и закоммитить вместе с изменением:
+    python benchmark.py --no-compare --save-baseline bench_baseline.json
+Числа зависят от машины: на другом железе сначала снимите свою базовую линию.
+
+Каждый случай — функция setup(**size) → вызываемое без аргументов; прогоняется по
+сетке размеров (длина окна, число окон, размер популяции, размер словаря).
+Замер как у timeit: число вызовов подбирается до min_time на повтор, берётся медиана
+и минимум по repeat повторам (секунды на вызов). Результаты — JSON с описанием
+окружения (версии python/numpy/scipy, платформа, коммит).
+
+Сравнение с базовой линией — по медиане: ratio = новая / базовая; ratio > 1 + threshold —
+регрессия, процесс завершается с кодом 1 (удобно для CI и ночных прогонов).
+Нет файла базовой линии — ошибка с кодом 2, а не молчаливый пропуск сравнения.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+# --- случаи ----------------------------------------------------------------
+
+def bench_coherence_score(window):
+    from resonance import coherence_score
+    x = np.random.default_rng(0).standard_normal(window)
+    return lambda: coherence_score(x, fps=1.0, target_hz=0.1, band=0.03)
+
+
+def bench_calculate_energy(window):
+    from physics import calculate_energy
+    rng = np.random.default_rng(0)
+    x, ref = rng.standard_normal(window), np.sin(2*np.pi*0.1*np.arange(window))
+    return lambda: calculate_energy(x, reference_wave=ref, fps=1.0)
+
+
+def _filled_memory(window, windows):
+    from wave_memory import WaveletMemory
+    memory = WaveletMemory(window_size=window, wavelet='db2', max_windows=windows,
+                           storage='ring', n_clusters=8)
+    rng = np.random.default_rng(0)
+    for _ in range(windows):
+        memory.push_series(rng.standard_normal(window), meta={'t': 0, 'phase': 'inhale', 'agent': 'a'})
+    return memory, rng
+
+
+def bench_push_series(window, windows):
+    memory, rng = _filled_memory(window, windows)
+    x = rng.standard_normal(window)
+    return lambda: memory.push_series(x, meta={'t': 0, 'phase': 'inhale', 'agent': 'a'})
+
+
+def bench_retrieve_centroids(window, windows):
+    memory, _ = _filled_memory(window, windows)
+    return lambda: memory.retrieve_centroids(k=8)
+
+
+def bench_consolidate(windows, window=32):
+    from sleep_cycle import consolidate
+    centroids = list(np.random.default_rng(0).standard_normal((windows, window)))
+    return lambda: consolidate(centroids)
+
+
+def bench_phase_at(steps):
+    from rhythm import BreathClock
+    clock = BreathClock()
+
+    def run():
+        for t in range(steps):
+            clock.phase_at(t)
+    return run
+
+
+def bench_phases_at(steps):
+    from rhythm import BreathClock
+    clock, t = BreathClock(), np.arange(steps)
+    return lambda: clock.phases_at(t)
+
+
+def bench_simulation(population, cycles=200):
+    from agent import PlanetAgent
+    from simulation import Simulation, SimulationConfig
+
+    def run():
+        agents = [PlanetAgent(f"a{i}", alpha=0.5, lr=0.1) for i in range(population)]
+        Simulation(SimulationConfig(n_cycles=cycles, seed=0), agents).run()
+    return run
+
+
+def bench_population_act(population):
+    from agent import AgentPopulation
+    pop = AgentPopulation(population, seed=0)
+    out = np.empty(population)
+    return lambda: pop.act(0, 0.25, out=out)
+
+
+def bench_llm_energy(vocab, seq_len=128):
+    from llm_resonance import LLMResonanceLayer
+    rng = np.random.default_rng(0)
+    layer = LLMResonanceLayer()
+    attention = rng.random((4, 4, seq_len, seq_len))
+    times = np.cumsum(rng.random(seq_len))
+    embedding, reference = rng.standard_normal(768), rng.standard_normal(768)
+    probs = rng.random((16, vocab))
+
+    def run():
+        layer.calculate_llm_energy(attention_weights=attention, token_times=times, response_embedding=embedding,
+                                   token_probs=probs, reference_embedding=reference)
+        layer.energy_history.clear()
+    return run
+
+
+# имя → (setup, полная сетка, быстрая сетка)
+CASES = {
+    'coherence_score': (bench_coherence_score,
+                        [{'window': w} for w in (32, 256, 4096)], [{'window': 32}]),
+    'calculate_energy': (bench_calculate_energy,
+                         [{'window': w} for w in (32, 256, 4096)], [{'window': 32}]),
+    'push_series': (bench_push_series,
+                    [{'window': w, 'windows': n} for w in (32, 128) for n in (512, 4096)],
+                    [{'window': 32, 'windows': 512}]),
+    'retrieve_centroids': (bench_retrieve_centroids,
+                           [{'window': w, 'windows': n} for w in (32, 128) for n in (512, 4096)],
+                           [{'window': 32, 'windows': 512}]),
+    'consolidate': (bench_consolidate,
+                    [{'windows': n} for n in (8, 64, 512)], [{'windows': 8}]),
+    'phase_at': (bench_phase_at, [{'steps': 1000}], [{'steps': 1000}]),
+    'phases_at': (bench_phases_at, [{'steps': n} for n in (1000, 100000)], [{'steps': 1000}]),
+    'simulation': (bench_simulation,
+                   [{'population': n} for n in (1, 2, 8)], [{'population': 2}]),
+    'population_act': (bench_population_act,
+                       [{'population': n} for n in (100, 10000)], [{'population': 100}]),
+    'llm_energy': (bench_llm_energy,
+                   [{'vocab': v} for v in (1000, 50000)], [{'vocab': 1000}]),
+}
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+
+# --- замер -----------------------------------------------------------------
+
+def measure(fn, repeat=5, min_time=0.2):
+    """(number, [секунд на вызов] × repeat): number подбирается, чтобы повтор длился ≥ min_time."""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t0) / number)
+    return number, times
+
+
+def case_key(name, params):
+    return name + ''.join(f" {k}={params[k]}" for k in sorted(params))
+
+
+def environment():
+    import scipy
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_suite(only=None, quick=False, repeat=5, min_time=0.2, log=print):
+    results = []
+    for name, (setup, full, small) in CASES.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        for params in (small if quick else full):
+            fn = setup(**params)
+            fn()   # прогрев: кэши планов, импорт, первый буфер шума
+            number, times = measure(fn, repeat=repeat, min_time=min_time)
+            row = {
+                'case': name,
+                'params': params,
+                'key': case_key(name, params),
+                'number': number,
+                'repeat': repeat,
+                'median_s': float(np.median(times)),
+                'min_s': float(np.min(times)),
+            }
+            results.append(row)
+            if log:
+                log(f"{row['key']:<48} {row['median_s'] * 1e6:12.2f} µs  (min {row['min_s'] * 1e6:.2f}, ×{number})")
+    return {'environment': environment(), 'results': results}
+
+
+def compare(current, baseline, threshold=0.2):
+    """
+    Строки сравнения {'key', 'baseline_s', 'current_s', 'ratio', 'status'}:
+    status — 'regression' (ratio > 1 + threshold), 'improved' (ratio < 1/(1 + threshold)),
+    'ok' либо 'new' (нет в базовой линии).
+    """
+    base = {row['key']: row for row in baseline['results']}
+    rows = []
+    for row in current['results']:
+        old = base.get(row['key'])
+        if old is None:
+            rows.append({'key': row['key'], 'baseline_s': None, 'current_s': row['median_s'],
+                         'ratio': None, 'status': 'new'})
+            continue
+        ratio = row['median_s'] / old['median_s']
+        status = 'regression' if ratio > 1 + threshold else 'improved' if ratio < 1 / (1 + threshold) else 'ok'
+        rows.append({'key': row['key'], 'baseline_s': old['median_s'], 'current_s': row['median_s'],
+                     'ratio': ratio, 'status': status})
+    return rows
+
+
+def _write_json(data, fname):
+    tmp = fname + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, fname)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки Planet Pattern")
+    parser.add_argument('--out', default='bench_results.json', help="куда записать результаты (JSON)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help="JSON базовой линии для сравнения (по умолчанию bench_baseline.json рядом со скриптом)")
+    parser.add_argument('--no-compare', action='store_true', help="не сравнивать с базовой линией")
+    parser.add_argument('--save-baseline', help="сохранить результаты как базовую линию")
+    parser.add_argument('--threshold', type=float, default=0.2, help="допустимое замедление (0.2 = +20%%)")
+    parser.add_argument('--only', nargs='*', help="подстроки имён случаев")
+    parser.add_argument('--quick', action='store_true', help="только малые размеры")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2)
+    args = parser.parse_args(argv)
+    if not args.no_compare and not os.path.exists(args.baseline):
+        print(f"❌ Нет базовой линии {args.baseline}: снимите её "
+              f"(python benchmark.py --no-compare --save-baseline {args.baseline}) или укажите --no-compare",
+              file=sys.stderr)
+        return 2
+
+    current = run_suite(only=args.only, quick=args.quick, repeat=args.repeat, min_time=args.min_time)
+    _write_json(current, args.out)
+    if args.save_baseline:
+        _write_json(current, args.save_baseline)
+
+    if args.no_compare:
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, threshold=args.threshold)
+    print(f"\nСравнение с {args.baseline} (порог +{args.threshold:.0%}):")
+    for row in rows:
+        ratio = '—' if row['ratio'] is None else f"{row['ratio']:.2f}×"
+        print(f"  {row['key']:<48} {ratio:>8}  {row['status']}")
+    regressions = [row for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"❌ Регрессий: {len(regressions)}")
+        return 1
+    print("✅ Регрессий нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# planet_pattern/clustering.py
+"""
+Инкрементальный k-means для кольцевой волновой памяти.
+
+Первые seed_pool окон копятся без кластеризации, затем один раз
+засеваются k-means++ (seeded rng) и уточняются несколькими итерациями Ллойда.
+Дальше для каждого кластера храним достаточные статистики (сумма и число окон),
+а для каждого слота памяти — номер его кластера. Тогда:
+- запись окна — назначение к ближайшему центру и += к статистикам;
+- вытеснение окна из кольца — −= из статистик его кластера;
+- центроиды = сумма / число, чтение за O(k·d), без перекластеризации.
+Устаревшие назначения (центры сдвигаются) понемногу пересматриваются:
+не более reassign_per_push слотов за запись, поэтому стоимость записи ограничена.
+"""
+import numpy as np
+
+
+class StreamingKMeans:
+    def __init__(self, k, dim, capacity, seed=0, reassign_per_push=32, seed_pool=None, lloyd_iters=5):
+        self.k = k
+        self.dim = dim
+        self.capacity = capacity
+        self.reassign_per_push = reassign_per_push
+        self.seed_pool = min(capacity, seed_pool or 4 * k)
+        self.lloyd_iters = lloyd_iters
+        self.rng = np.random.default_rng(seed)
+        self.initialized = False
+        self._pending = {}   # слот → окно, пока кластеры не засеяны
+        self.sums = np.zeros((k, dim))
+        self.counts = np.zeros(k, dtype=np.int64)
+        self.centers = np.zeros((k, dim))
+        self.assign = np.full(capacity, -1, dtype=np.int64)   # кластер слота (-1 — пусто)
+        self._cursor = 0
+
+    def _nearest(self, X):
+        live = np.flatnonzero(self.counts > 0)
+        d2 = (X * X).sum(axis=1)[:, None] - 2.0 * X @ self.centers[live].T + (self.centers[live] ** 2).sum(axis=1)
+        return live[np.argmin(d2, axis=1)]
+
+    def _refresh(self, clusters):
+        clusters = np.unique(clusters)
+        nz = clusters[self.counts[clusters] > 0]
+        self.centers[nz] = self.sums[nz] / self.counts[nz, None]
+
+    def _initialize(self):
+        """k-means++ по накопленному пулу + несколько итераций Ллойда."""
+        slots = np.fromiter(self._pending.keys(), dtype=np.int64)
+        P = np.stack(list(self._pending.values()))
+        self._pending = {}
+        k = min(self.k, len(P))
+        centers = [P[self.rng.integers(len(P))]]
+        d2 = ((P - centers[0]) ** 2).sum(axis=1)
+        for _ in range(1, k):
+            total = d2.sum()
+            i = self.rng.choice(len(P), p=d2 / total) if total > 0 else self.rng.integers(len(P))
+            centers.append(P[i])
+            d2 = np.minimum(d2, ((P - P[i]) ** 2).sum(axis=1))
+        self.centers[:k] = centers
+        self.counts[:k] = 1
+        for _ in range(max(1, self.lloyd_iters)):
+            labels = self._nearest(P)
+            self.sums[:] = 0.0
+            np.add.at(self.sums, labels, P)
+            self.counts[:] = np.bincount(labels, minlength=self.k)
+            self._refresh(np.arange(self.k))
+        self.assign[slots] = labels
+        self.initialized = True
+
+    def add(self, slots, X):
+        """Новые окна X в слотах slots."""
+        slots = np.asarray(slots)
+        X = np.atleast_2d(X)
+        if not self.initialized:
+            for slot, x in zip(slots, X):
+                self._pending[int(slot)] = x.copy()
+            if len(self._pending) >= self.seed_pool:
+                self._initialize()
+            return
+        labels = self._nearest(X)
+        np.add.at(self.sums, labels, X)
+        self.counts += np.bincount(labels, minlength=self.k)
+        self.assign[slots] = labels
+        self._refresh(labels)
+
+    def remove(self, slots, X):
+        """Окна X вытесняются из слотов slots."""
+        slots = np.asarray(slots)
+        if not self.initialized:
+            for slot in slots:
+                self._pending.pop(int(slot), None)
+            return
+        labels = self.assign[slots]
+        keep = labels >= 0
+        labels, X = labels[keep], np.atleast_2d(X)[keep]
+        np.subtract.at(self.sums, labels, X)
+        self.counts -= np.bincount(labels, minlength=self.k)
+        self.assign[slots[keep]] = -1
+        self._refresh(labels)
+
+    def reassign(self, rows, size):
+        """
+        rows(slots) → коэффициенты окон в слотах (декодированные).
+        Пересматривает назначения следующих reassign_per_push занятых слотов
+        и пересевает опустевшие кластеры случайным окном из памяти (seeded rng).
+        """
+        if not self.initialized or not size or not self.reassign_per_push:
+            return
+        n = min(self.reassign_per_push, size)
+        slots = (self._cursor + np.arange(n)) % size
+        self._cursor = (self._cursor + n) % size
+        X = rows(slots)
+        old = self.assign[slots]
+        new = self._nearest(X)
+        moved = old != new
+        if moved.any():
+            np.subtract.at(self.sums, old[moved], X[moved])
+            np.add.at(self.sums, new[moved], X[moved])
+            self.counts -= np.bincount(old[moved], minlength=self.k)
+            self.counts += np.bincount(new[moved], minlength=self.k)
+            self.assign[slots[moved]] = new[moved]
+            self._refresh(np.concatenate([old[moved], new[moved]]))
+
+        for c in np.flatnonzero(self.counts == 0):
+            donor = int(self.rng.integers(size))
+            src = self.assign[donor]
+            if self.counts[src] <= 1:
+                continue
+            x = rows(np.array([donor]))[0]
+            self.sums[src] -= x
+            self.counts[src] -= 1
+            self.sums[c] = x
+            self.counts[c] = 1
+            self.assign[donor] = c
+            self._refresh(np.array([src, c]))
+
+    def centroids(self):
+        """Текущие центры непустых кластеров (k', dim); до посева — равномерная выборка пула."""
+        if not self.initialized:
+            pool = np.stack(list(self._pending.values())) if self._pending else np.zeros((0, self.dim))
+            return pool[::max(1, len(pool) // self.k)][:self.k]
+        return self.centers[self.counts > 0]
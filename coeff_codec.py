@@ -0,0 +1,144 @@
+# planet_pattern/coeff_codec.py
+"""
+Кодирование DWT-коэффициентов в волновой памяти.
+
+Большинство детализирующих коэффициентов дыхательного сигнала близки к нулю,
+поэтому хранить каждое окно как float64 расточительно:
+    'float64' — без потерь (по умолчанию)
+    'float16' — половинная точность, 4× компактнее
+    'int8'    — int8 с масштабом на окно (max|c| / 127), ~8× компактнее
+    'topk'    — разреженно: только top_k коэффициентов по модулю (float32 + индекс uint16)
+
+Каждый кодек хранит окна в предвыделенных колонках (capacity, ...) — по уровням
+разложения — и декодирует их прозрачно при чтении.
+"""
+import numpy as np
+
+
+class Float64Codec:
+    """
+    Коэффициенты хранятся по уровням разложения: отдельный массив (capacity, size_j)
+    на каждую полосу wavedec [cA, cD_n, ..., cD_1]. Грубые полосы лежат непрерывно —
+    чтение «только аппроксимации» не трогает детализирующие коэффициенты.
+    """
+    name = 'float64'
+    dtype = np.float64
+
+    def __init__(self, dim, capacity, level_sizes=None):
+        self.dim = dim
+        self.level_sizes = tuple(level_sizes or (dim,))
+        self.bounds = np.concatenate([[0], np.cumsum(self.level_sizes)])
+        self.levels = [np.zeros((capacity, size), dtype=self.dtype) for size in self.level_sizes]
+
+    @property
+    def bytes_per_window(self):
+        return self.dim * np.dtype(self.dtype).itemsize
+
+    @property
+    def nbytes(self):
+        return sum(lv.nbytes for lv in self.levels)
+
+    def write(self, slots, packed):
+        for j, lv in enumerate(self.levels):
+            lv[slots] = packed[:, self.bounds[j]:self.bounds[j + 1]]
+
+    def read(self, slots, upto=None):
+        """Декодированные коэффициенты первых upto полос (по умолчанию всех) для слотов."""
+        parts = [self.level(j, slots) for j in range(upto or len(self.levels))]
+        return np.concatenate(parts, axis=1).astype(float, copy=False)
+
+    def level(self, j, rows):
+        """
+        Полоса j для строк rows (срез или массив слотов). Для float64 и среза —
+        представление без копии; для float16 — в исходном dtype (приведение при вычислениях).
+        """
+        return self.levels[j][rows]
+
+    def matrix(self, n):
+        """Первые n строк как float-матрица (n, dim)."""
+        return self.read(slice(0, n))
+
+
+class Float16Codec(Float64Codec):
+    name = 'float16'
+    dtype = np.float16
+
+
+class Int8Codec(Float64Codec):
+    name = 'int8'
+    dtype = np.int8
+
+    def __init__(self, dim, capacity, level_sizes=None):
+        super().__init__(dim, capacity, level_sizes)
+        self.scale = np.zeros(capacity, dtype=np.float32)
+
+    @property
+    def bytes_per_window(self):
+        return self.dim + self.scale.itemsize
+
+    @property
+    def nbytes(self):
+        return super().nbytes + self.scale.nbytes
+
+    def write(self, slots, packed):
+        scale = np.abs(packed).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        self.scale[slots] = scale
+        super().write(slots, np.rint(packed / scale[:, None]).astype(np.int8))
+
+    def level(self, j, rows):
+        return self.levels[j][rows] * self.scale[rows, None].astype(float)
+
+
+class TopKCodec:
+    """Разреженное кодирование: полосы восстанавливаются из декодированной строки."""
+    name = 'topk'
+
+    def __init__(self, dim, capacity, top_k=8, level_sizes=None):
+        self.dim = dim
+        self.level_sizes = tuple(level_sizes or (dim,))
+        self.bounds = np.concatenate([[0], np.cumsum(self.level_sizes)])
+        self.top_k = min(top_k, dim)
+        self.values = np.zeros((capacity, self.top_k), dtype=np.float32)
+        self.index = np.zeros((capacity, self.top_k), dtype=np.uint16)
+
+    @property
+    def bytes_per_window(self):
+        return self.top_k * (self.values.itemsize + self.index.itemsize)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.index.nbytes
+
+    def write(self, slots, packed):
+        idx = np.argpartition(np.abs(packed), -self.top_k, axis=1)[:, -self.top_k:]
+        self.index[slots] = idx
+        self.values[slots] = np.take_along_axis(packed, idx, axis=1)
+
+    def read(self, slots, upto=None):
+        index, values = self.index[slots], self.values[slots]
+        out = np.zeros((len(index), self.dim))
+        np.put_along_axis(out, index.astype(np.intp), values, axis=1)
+        return out if upto is None else out[:, :self.bounds[upto]]
+
+    def level(self, j, rows):
+        return self.read(rows)[:, self.bounds[j]:self.bounds[j + 1]]
+
+    def matrix(self, n):
+        return self.read(slice(0, n))
+
+
+CODECS = {
+    'float64': Float64Codec,
+    'float16': Float16Codec,
+    'int8': Int8Codec,
+    'topk': TopKCodec,
+}
+
+
+def make_codec(encoding, dim, capacity, top_k=8, level_sizes=None):
+    if encoding not in CODECS:
+        raise ValueError(f"Неизвестное кодирование {encoding!r}: ожидается одно из {sorted(CODECS)}")
+    if encoding == 'topk':
+        return TopKCodec(dim, capacity, top_k=top_k, level_sizes=level_sizes)
+    return CODECS[encoding](dim, capacity, level_sizes=level_sizes)
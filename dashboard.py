@@ -2,17 +2,18 @@
 """
 Streamlit дашборд для Planet Pattern
 """
+import threading
+import time
+
 import streamlit as st
 import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-from rhythm import BreathClock
-from agent import PlanetAgent, FixedAgent
-from resonance import coherence_score
-from physics import calculate_energy
-from wave_memory import WaveletMemory
-from sleep_cycle import consolidate
+from agent import PlanetAgent
+from simulation import Simulation, SimulationConfig
+from simulation_jobs import JobRegistry
+from decimation import MinMaxPyramid, sleep_markers
 
 st.set_page_config(
     page_title="Planet Pattern — Живой Интеллект",
@@ -20,6 +21,74 @@ st.set_page_config(
     layout="wide",
 )
 
+
+@st.cache_resource
+def job_registry():
+    """Общий для всех сессий реестр прогонов: одинаковые параметры считаются один раз."""
+    return JobRegistry(max_jobs=32, chunk_steps=2048)
+
+
+def build_simulation(n_cycles, sleep_every, breaths_per_min, alpha_init, lr, seed):
+    agent_live = PlanetAgent(name="GaiaLink", alpha=alpha_init, lr=lr)
+    config = SimulationConfig(
+        n_cycles=n_cycles, fps=1.0, sleep_every=sleep_every,
+        target_hz=breaths_per_min / 60.0, band=0.03, learn_target=50.0,
+        breaths_per_min=breaths_per_min, seed=seed,
+    )
+    return Simulation(config, [agent_live])
+
+
+MAX_POINTS = 2000   # точек на ряд, отправляемых в браузер
+
+
+class SeriesPyramids:
+    """
+    Пирамиды min/max рядов одного прогона, дописываемые по мере его хода:
+    каждый опрос добавляет только новые точки снимка (MinMaxPyramid.update),
+    а не строит пирамиды заново по всей длине.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pyramids = None
+        self._coherence_sum = 0.0
+        self._n_checks = 0
+
+    def update(self, snap):
+        with self._lock:
+            times = snap["coherence_t"]
+            energy = snap["energy"]
+            coherence = snap["coherence"][:, 0]
+            series = {name: energy[name][:, 0] for name in "ARLSE"}
+            series["coherence"] = coherence
+            # прогон с тем же ключом перезапущен (вытеснен из реестра) — строим заново
+            if self.pyramids is None or len(snap["alpha"]) < len(self.pyramids["alpha"]):
+                self._coherence_sum, self._n_checks = 0.0, 0
+                self.pyramids = {name: MinMaxPyramid(y, x=times) for name, y in series.items()}
+                self.pyramids["alpha"] = MinMaxPyramid(snap["alpha"][:, 0])
+            else:
+                for name, y in series.items():
+                    self.pyramids[name].update(y, x=times)
+                self.pyramids["alpha"].update(snap["alpha"][:, 0])
+            self._coherence_sum += float(coherence[self._n_checks:].sum())
+            self._n_checks = len(coherence)
+            results = dict(self.pyramids)
+            results.update({
+                "n": snap["t"],
+                "coherence_mean": self._coherence_sum / self._n_checks if self._n_checks else 0.0,
+                "energy_last": float(energy["E"][-1, 0]) if len(energy) else 0.0,
+                "signal_tail": snap["signals"][-100:, 0].copy(),
+                "sleep_events": np.asarray(snap["sleep_t"]),
+                "final_alpha": snap["final_alpha"][0] if snap["final_alpha"] else float(snap["alpha"][-1, 0]),
+            })
+            return results
+
+
+@st.cache_resource(max_entries=64)
+def series_pyramids(key):
+    """Пирамиды прогона key — одни на все сессии, которые смотрят тот же прогон."""
+    return SeriesPyramids()
+
+
 st.title("🌍 Planet Pattern — Живой Интеллект")
 st.markdown("**Ритмическая архитектура обучения: дыхание, волновая память, обратимость**")
 
@@ -45,108 +114,87 @@ with st.sidebar:
     lr = st.slider("Learning rate", 0.01, 0.2, 0.1, 0.01)
     
     # Количество циклов
-    n_cycles = st.slider("Количество циклов", 50, 500, 200, 50)
+    n_cycles = st.select_slider("Количество циклов",
+                                options=[50, 100, 200, 500, 1000, 5000, 20000, 100000], value=200)
     
     # Сон
     sleep_every = st.slider("Сон каждые N циклов", 10, 100, 40, 10)
     
+    seed = st.number_input("Seed", min_value=0, value=0, step=1,
+                           help="Одинаковые параметры и seed — один и тот же прогон (из кэша)")
+    
     st.markdown("---")
     
     if st.button("🚀 Запустить симуляцию", type="primary", use_container_width=True):
         st.session_state.run_simulation = True
+        st.session_state.job_key = (int(n_cycles), int(sleep_every), float(breaths_per_min),
+                                    float(alpha_init), float(lr), int(seed))
+        st.session_state.pop("results", None)
+        st.session_state.job_restart = True
 
-# Основная панель
+# Основная панель: прогон идёт в фоновом потоке, страница перерисовывается по мере готовности кусков
+job = None
+busy = False     # очередь реестра заполнена — повторить запрос при следующем опросе
 if st.session_state.get("run_simulation", False):
-    with st.spinner("⏳ Система работает..."):
-        # Инициализация
-        clock = BreathClock()
-        memory_live = WaveletMemory(window_size=32, wavelet='db2', max_windows=512)
-        
-        agent_live = PlanetAgent(name="GaiaLink", alpha=alpha_init, lr=lr)
-        
-        target_wave = clock.target_wave(n_cycles, breaths_per_min=breaths_per_min, fps=1.0)
-        
-        # Буферы
-        window = []
-        alpha_history = []
-        coherence_history = []
-        energy_history = []
-        energy_components = {"A": [], "R": [], "L": [], "S": []}
-        sleep_events = []
-        
-        # Симуляция
-        for t in range(n_cycles):
-            phase, prog = clock.phase_at(t)
-            y = agent_live.act(phase, prog)
-            window.append(y)
-            alpha_history.append(agent_live.alpha)
-            
-            # Когерентность и энергия
-            if len(window) >= 32 and t % 8 == 0:
-                score = coherence_score(window[-32:], fps=1.0, target_hz=target_hz, band=0.03)
-                coherence_history.append((t, score))
-                agent_live.learn(score, target=50.0)
-                
-                energy = calculate_energy(
-                    np.array(window[-32:]),
-                    reference_wave=target_wave[max(0, t-31):t+1],
-                    fps=1.0
-                )
-                energy_history.append((t, energy["E"]))
-                for key in energy_components:
-                    energy_components[key].append((t, energy[key]))
-            
-            # Волновая память
-            if len(window) >= 32 and t % 16 == 0:
-                memory_live.push_series(np.array(window[-32:]), meta={'t': t, 'phase': phase})
-            
-            # Сон
-            if (t + 1) % sleep_every == 0:
-                centroids = memory_live.retrieve_centroids(k=8)
-                core = consolidate(centroids)
-                if core is not None:
-                    drift = float(np.mean(np.abs(core)))
-                    agent_live.alpha = float(np.clip(agent_live.alpha * (1.0 + 0.05*drift), 0.1, 1.0))
-                sleep_events.append(t + 1)
-        
-        # Сохранить результаты
-        st.session_state.results = {
-            "window": window,
-            "alpha_history": alpha_history,
-            "coherence_history": coherence_history,
-            "energy_history": energy_history,
-            "energy_components": energy_components,
-            "sleep_events": sleep_events,
-            "final_alpha": agent_live.alpha,
-        }
+    key = st.session_state.job_key
+    # кнопка «Запустить» пересчитывает отменённый или упавший прогон, опрос — нет
+    restart = st.session_state.pop("job_restart", False)
+    try:
+        job = job_registry().get_or_start(key, lambda: build_simulation(*key), restart=restart)
+    except RuntimeError:
+        st.warning("⏳ Сервер занят: слишком много прогонов в очереди, повторяем запрос...")
+        busy = True
+        st.session_state.job_restart = restart
+    if job is not None:
+        if job.status == 'error':
+            st.error(f"Симуляция упала: {job.error!r}")
+        elif job.status == 'cancelled':
+            st.warning("Прогон отменён — нажмите «Запустить симуляцию», чтобы посчитать заново")
+        snap = job.snapshot()
+        if snap is not None and snap["t"] > 0:
+            st.session_state.results = series_pyramids(key).update(snap)
+        if job.status == 'pending':
+            st.progress(0.0, text="⏳ Прогон в очереди — ждёт свободного места...")
+        elif not job.done:
+            st.progress(job.progress, text=f"⏳ Система работает... {snap['t'] if snap else 0}/{key[0]} циклов")
 
-# Визуализация
+# Визуализация: в браузер уходит не больше MAX_POINTS точек на ряд при любой длине прогона
 if "results" in st.session_state:
     results = st.session_state.results
+    n = results["n"]
+    
+    x0, x1 = 0, n - 1
+    if n > 2:
+        x0, x1 = st.slider("Видимый диапазон циклов", 0, n - 1, (0, n - 1))
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📈 Динамика Alpha")
         fig_alpha = go.Figure()
+        x, y = results["alpha"].view(x0, x1, MAX_POINTS)
         fig_alpha.add_trace(go.Scatter(
-            y=results["alpha_history"],
+            x=x,
+            y=y,
             mode='lines',
             name='Alpha',
             line=dict(color='#00ff88', width=2)
         ))
-        # Отметить события сна
-        for sleep_t in results["sleep_events"]:
-            fig_alpha.add_vline(
-                x=sleep_t,
-                line_dash="dash",
-                line_color="cyan",
-                annotation_text=f"💤 {sleep_t}"
-            )
+        # События сна — одной линией с разрывами, а не фигурой на каждое событие
+        x, y = sleep_markers(results["sleep_events"], 0.0, 1.0, x0, x1)
+        fig_alpha.add_trace(go.Scatter(
+            x=x,
+            y=y,
+            mode='lines',
+            name='💤 Сон',
+            line=dict(color='cyan', width=1, dash='dash'),
+            hovertemplate="💤 %{x}<extra></extra>",
+        ))
         fig_alpha.update_layout(
             xaxis_title="Цикл",
             yaxis_title="Alpha",
-            height=300
+            height=300,
+            showlegend=False,
         )
         st.plotly_chart(fig_alpha, use_container_width=True)
         
@@ -155,9 +203,8 @@ if "results" in st.session_state:
     with col2:
         st.subheader("🌊 Сигнал агента (последние 100 циклов)")
         fig_signal = go.Figure()
-        signal = results["window"][-100:]
         fig_signal.add_trace(go.Scatter(
-            y=signal,
+            y=results["signal_tail"],
             mode='lines',
             name='Сигнал',
             line=dict(color='#ff8800', width=1)
@@ -174,13 +221,13 @@ if "results" in st.session_state:
     
     with col3:
         st.subheader("🎯 Когерентность")
-        if results["coherence_history"]:
-            times, scores = zip(*results["coherence_history"])
+        if len(results["coherence"]):
+            times, scores = results["coherence"].view(x0, x1, MAX_POINTS)
             fig_coh = go.Figure()
             fig_coh.add_trace(go.Scatter(
                 x=times,
                 y=scores,
-                mode='lines+markers',
+                mode='lines+markers' if len(times) <= 200 else 'lines',
                 name='Когерентность',
                 line=dict(color='#0088ff', width=2),
                 marker=dict(size=4)
@@ -191,18 +238,17 @@ if "results" in st.session_state:
                 height=300
             )
             st.plotly_chart(fig_coh, use_container_width=True)
-            if scores:
-                st.metric("Средняя когерентность", f"{np.mean(scores):.1f}%")
+            st.metric("Средняя когерентность", f"{results['coherence_mean']:.1f}%")
     
     with col4:
         st.subheader("⚡ Энергия E = A × R × L − S")
-        if results["energy_history"]:
-            times, energies = zip(*results["energy_history"])
+        if len(results["E"]):
+            times, energies = results["E"].view(x0, x1, MAX_POINTS)
             fig_energy = go.Figure()
             fig_energy.add_trace(go.Scatter(
                 x=times,
                 y=energies,
-                mode='lines+markers',
+                mode='lines+markers' if len(times) <= 200 else 'lines',
                 name='E',
                 line=dict(color='#ff0088', width=2),
                 marker=dict(size=4)
@@ -214,12 +260,11 @@ if "results" in st.session_state:
                 height=300
             )
             st.plotly_chart(fig_energy, use_container_width=True)
-            if energies:
-                st.metric("Финальная энергия", f"{energies[-1]:.3f}")
+            st.metric("Финальная энергия", f"{results['energy_last']:.3f}")
     
     # Компоненты энергии
     st.subheader("🧬 Компоненты энергии")
-    if results["energy_components"]["A"]:
+    if len(results["A"]):
         fig_components = make_subplots(
             rows=2, cols=2,
             subplot_titles=("A (Внимание)", "R (Резонанс)", "L (Любовь)", "S (Шум)"),
@@ -227,14 +272,13 @@ if "results" in st.session_state:
         )
         
         for i, (key, label) in enumerate([("A", "Внимание"), ("R", "Резонанс"), ("L", "Любовь"), ("S", "Шум")]):
-            if results["energy_components"][key]:
-                times, values = zip(*results["energy_components"][key])
-                row = (i // 2) + 1
-                col = (i % 2) + 1
-                fig_components.add_trace(
-                    go.Scatter(x=times, y=values, mode='lines', name=label),
-                    row=row, col=col
-                )
+            times, values = results[key].view(x0, x1, MAX_POINTS // 2)
+            row = (i // 2) + 1
+            col = (i % 2) + 1
+            fig_components.add_trace(
+                go.Scatter(x=times, y=values, mode='lines', name=label),
+                row=row, col=col
+            )
         
         fig_components.update_layout(height=500, showlegend=False)
         st.plotly_chart(fig_components, use_container_width=True)
@@ -261,3 +305,9 @@ else:
         Это не готовый продукт, а исследовательский прототип.
         """)
 
+# Прогон ещё идёт или ждёт в очереди — перерисовать страницу со следующими кусками,
+# в том числе пока первых результатов ещё нет
+if busy or (job is not None and not job.done):
+    time.sleep(0.5)
+    st.rerun()
+
@@ -1,8 +1,15 @@
+import os
+import sys
+
 import streamlit as st
 import numpy as np
-from scipy.signal import correlate
+import pandas as pd
 from scipy.fft import rfft, rfftfreq
-from scipy.stats import entropy
+
+# Модули ядра лежат уровнем выше (physics.py, decimation.py, llm_resonance.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from physics import ENERGY_DTYPE, energy_kernel
+from decimation import MinMaxPyramid
 
 st.set_page_config(page_title="Planet Pattern v2", layout="wide")
 
@@ -58,44 +65,69 @@ alpha_fixed = st.sidebar.slider("Alpha механического", 0.1, 1.0, 0.
 
 compare_agents = st.sidebar.checkbox("Сравнить два агента", value=True)
 
-# Генерация сигналов для двух агентов
-t = np.linspace(0, 10, 500)
-signal = np.sin(2 * np.pi * freq * t)
-noise_live = np.random.normal(0, noise_level, len(t))
-noise_fixed = np.random.normal(0, noise_level, len(t))
+seed = st.sidebar.number_input("Seed", min_value=0, value=0, step=1,
+                               help="Один и тот же seed — одна и та же реализация шума")
+monte_carlo = st.sidebar.checkbox("Монте-Карло", value=False,
+                                  help="Оценить энергию по сотням реализаций шума сразу")
+n_draws = st.sidebar.slider("Реализаций шума", 100, 2000, 500, 100) if monte_carlo else 1
+
+N_SAMPLES = 500
+DURATION = 10.0
+MAX_POINTS = 600    # точек на график
+
+
+@st.cache_data(max_entries=256)
+def score_agents(freq, noise_level, alpha_live, alpha_fixed, seed, n_draws=1):
+    """
+    Оба агента и все реализации шума — одним пакетным вызовом energy_kernel
+    (та же формула и та же полоса 0.1 ± 0.03 Гц, что в physics.py).
+    Кэш общий для всех сессий: ключ — параметры слайдеров и seed.
+    """
+    t = np.linspace(0, DURATION, N_SAMPLES)
+    fps = 1.0 / (t[1] - t[0])
+    signal = np.sin(2 * np.pi * freq * t)
+    ref = np.sin(2 * np.pi * 0.1 * t)     # эталон дыхания
 
-# Живой агент (адаптивный alpha)
-mixed_live = alpha_live * signal + (1 - alpha_live) * noise_live
+    # (n_draws, 2, N): строка 0 — живой агент, строка 1 — механический
+    noise = np.random.default_rng(seed).normal(0, noise_level, (n_draws, 2, N_SAMPLES))
+    alpha = np.array([alpha_live, alpha_fixed])[None, :, None]
+    mixed = alpha * signal + (1 - alpha) * noise
 
-# Механический агент (фиксированный alpha)
-mixed_fixed = alpha_fixed * signal + (1 - alpha_fixed) * noise_fixed
+    energy = energy_kernel(mixed.reshape(-1, N_SAMPLES), reference_wave=ref, fps=fps).reshape(n_draws, 2)
+    return {
+        "t": t,
+        "signal": signal,
+        "ref": ref,
+        "mixed": mixed[0],                                  # первая реализация — для графиков
+        "energy": energy,                                   # ENERGY_DTYPE (n_draws, 2)
+        "fft_freq": rfftfreq(N_SAMPLES, 1.0 / fps),
+        "fft_vals": np.abs(rfft(mixed[0, 0])),
+    }
 
-# Для сравнения
-mixed = mixed_live if not compare_agents else mixed_live
 
-# Эталон дыхания
-ref = np.sin(2 * np.pi * 0.1 * t)
+def chart_frame(t, series, max_points=MAX_POINTS):
+    """Ряды на общей оси t, прореженные по min/max (индексы — объединение по всем рядам)."""
+    per_series = max(2, max_points // len(series))
+    idx = np.unique(np.concatenate([MinMaxPyramid(y).view(max_points=per_series)[0] for y in series.values()]))
+    return pd.DataFrame({name: np.asarray(y)[idx] for name, y in series.items()}, index=t[idx])
 
-# FFT (резонанс)
-fft_vals = np.abs(rfft(mixed))
-fft_freq = rfftfreq(len(t), t[1] - t[0])
-band_mask = (fft_freq > 0.09) & (fft_freq < 0.11)
-resonance = np.sum(fft_vals[band_mask]) / (np.sum(fft_vals) + 1e-9)
 
-# Корреляция (любовь)
-correlation = np.corrcoef(mixed, ref)[0, 1]
-love = (correlation + 1.0) / 2.0 if not np.isnan(correlation) else 0.0
+def as_dict(row):
+    return {name: float(row[name]) for name in ENERGY_DTYPE.names}
 
-# Внимание
-attention = np.mean(np.abs(mixed))
 
-# Шум (энтропия)
-spec = np.abs(fft_vals)
-spec = spec / (np.sum(spec) + 1e-9)
-s = entropy(spec + 1e-9)
+scored = score_agents(freq, noise_level, alpha_live, alpha_fixed, int(seed), n_draws)
+t = scored["t"]
+signal = scored["signal"]
+ref = scored["ref"]
+mixed_live, mixed_fixed = scored["mixed"]
+mixed = mixed_live
 
-# Энергия жизни
-E = attention * resonance * love - s
+# Энергия первой реализации шума (живой агент — для режима одного агента)
+energy_live = as_dict(scored["energy"][0, 0])
+energy_fixed = as_dict(scored["energy"][0, 1])
+attention, resonance, love, s, E = (energy_live[k] for k in "ARLSE")
+fft_freq, fft_vals = scored["fft_freq"], scored["fft_vals"]
 
 # Графики
 st.markdown("---")
@@ -113,47 +145,30 @@ if compare_agents:
     
     with col_chart1:
         st.markdown("**🌱 Живой агент (GaiaLink)**")
-        st.line_chart({
-            "Идеальный ритм": signal[:100],
-            "Живой сигнал": mixed_live[:100],
-            "Эталон": ref[:100]
-        })
+        st.line_chart(chart_frame(t, {
+            "Идеальный ритм": signal,
+            "Живой сигнал": mixed_live,
+            "Эталон": ref
+        }))
     
     with col_chart2:
         st.markdown("**⚙️ Механический агент (Mechanic)**")
-        st.line_chart({
-            "Идеальный ритм": signal[:100],
-            "Механический сигнал": mixed_fixed[:100],
-            "Эталон": ref[:100]
-        })
+        st.line_chart(chart_frame(t, {
+            "Идеальный ритм": signal,
+            "Механический сигнал": mixed_fixed,
+            "Эталон": ref
+        }))
 else:
     col_main, col_metrics = st.columns([2, 1])
     with col_main:
         st.subheader("💓 Волна агента")
-        st.line_chart({
-            "Идеальный ритм": signal[:100],
-            "Смешанный сигнал": mixed[:100],
-            "Эталон": ref[:100]
-        })
+        st.line_chart(chart_frame(t, {
+            "Идеальный ритм": signal,
+            "Смешанный сигнал": mixed,
+            "Эталон": ref
+        }))
 
 if compare_agents:
-    # Расчёт для обоих агентов
-    def calc_energy(signal_arr, ref_arr):
-        fft_vals = np.abs(rfft(signal_arr))
-        fft_freq = rfftfreq(len(signal_arr), t[1] - t[0])
-        band_mask = (fft_freq > 0.09) & (fft_freq < 0.11)
-        R = np.sum(fft_vals[band_mask]) / (np.sum(fft_vals) + 1e-9)
-        corr = np.corrcoef(signal_arr, ref_arr)[0, 1]
-        L = (corr + 1.0) / 2.0 if not np.isnan(corr) else 0.0
-        A = np.mean(np.abs(signal_arr))
-        spec = np.abs(fft_vals)
-        spec = spec / (np.sum(spec) + 1e-9)
-        S = entropy(spec + 1e-9)
-        return {"A": A, "R": R, "L": L, "S": S, "E": A * R * L - S}
-    
-    energy_live = calc_energy(mixed_live, ref)
-    energy_fixed = calc_energy(mixed_fixed, ref)
-    
     # Метрики сравнения
     col1, col2 = st.columns(2)
     
@@ -215,6 +230,25 @@ else:
         else:
             st.error("⚠️ **Хаос.** Агент теряет когерентность.")
 
+# Монте-Карло: распределение энергии по всем реализациям шума
+if monte_carlo:
+    st.markdown("---")
+    st.subheader(f"🎲 Монте-Карло: {n_draws} реализаций шума")
+    st.caption("Одна реализация шума может случайно оказаться удачной — распределение показывает, чего ждать в среднем.")
+    E_draws = scored["energy"]["E"]          # (n_draws, 2)
+    col_mc1, col_mc2, col_mc3 = st.columns(3)
+    with col_mc1:
+        st.metric("🌱 E живого (среднее ± σ)", f"{E_draws[:, 0].mean():.3f} ± {E_draws[:, 0].std():.3f}")
+    with col_mc2:
+        st.metric("⚙️ E механического (среднее ± σ)", f"{E_draws[:, 1].mean():.3f} ± {E_draws[:, 1].std():.3f}")
+    with col_mc3:
+        st.metric("P(живой > механический)", f"{(E_draws[:, 0] > E_draws[:, 1]).mean():.0%}")
+    edges = np.histogram_bin_edges(E_draws, bins=40)
+    st.bar_chart(pd.DataFrame({
+        "Живой": np.histogram(E_draws[:, 0], bins=edges)[0],
+        "Механический": np.histogram(E_draws[:, 1], bins=edges)[0],
+    }, index=np.round((edges[:-1] + edges[1:]) / 2, 3)))
+
 # Спектр
 st.markdown("---")
 st.subheader("🌊 Спектр сигнала (FFT)")
@@ -276,9 +310,6 @@ with st.expander("🧠 Измерь живость текста", expanded=False
     
     if st.button("🔎 Посчитать энергию", type="primary"):
         try:
-            import sys
-            import os
-            sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
             from llm_resonance import LLMResonanceLayer
             
             if not user_text or len(user_text.strip()) < 5:
@@ -0,0 +1,137 @@
+# planet_pattern/decimation.py
+"""
+Прореживание длинных рядов для графиков (на стороне сервера).
+
+MinMaxPyramid строится по ряду один раз за O(n) (растущий ряд — update за O(новых точек)): уровень k хранит для блоков
+по factor^k соседних точек индексы минимума и максимума. Запрос view(start, stop,
+max_points) берёт самый мелкий уровень, на котором видимый диапазон укладывается
+в max_points точек, и отдаёт пары (min, max) каждого блока в порядке времени.
+Пики и провалы сохраняются на любом масштабе (в отличие от шага через k точек),
+а объём данных для браузера ограничен max_points независимо от длины ряда.
+
+sleep_markers — все события сна одной линией (разрывы через NaN) вместо N фигур.
+"""
+import numpy as np
+
+
+class MinMaxPyramid:
+    def __init__(self, y, x=None, factor=4):
+        self.factor = int(factor)
+        self.y = np.zeros(0)
+        self._x = None
+        self._levels = []     # [lo_buf, hi_buf, count] — буферы с запасом, как у list
+        self.update(y, x)
+
+    @property
+    def x(self):
+        return np.arange(len(self.y)) if self._x is None else self._x
+
+    @property
+    def levels(self):
+        """[(lo_idx, hi_idx)] для блоков factor^1, factor^2, ..."""
+        return [(lo[:n], hi[:n]) for lo, hi, n in self._levels]
+
+    def update(self, y, x=None):
+        """
+        Ряд дописался: y (и x) — весь ряд, первые len(self) точек прежние
+        (например, растущие срезы массивов SimulationJob.snapshot()).
+        Пересчитываются только блоки, задетые новыми точками, — O(новых точек + число уровней · factor),
+        а не O(n) на каждый опрос.
+        """
+        old = len(self.y)
+        self.y = np.asarray(y, dtype=float)
+        self._x = None if x is None else np.asarray(x)
+        n = len(self.y)
+        changed = old     # первый изменившийся блок текущего уровня
+        size = n          # блоков на текущем уровне
+        prev = None       # (lo, hi) текущего уровня; None — уровень точек
+        k = 0
+        while size > 1:
+            changed //= self.factor
+            start = changed * self.factor
+            if prev is None:
+                lo = hi = np.arange(start, size)
+            else:
+                lo, hi = prev[0][start:size], prev[1][start:size]
+            lo, hi = self._coarsen(lo, hi)
+            if k == len(self._levels):
+                self._levels.append([np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 0])
+            level = self._levels[k]
+            size = changed + len(lo)
+            if len(level[0]) < size:
+                # прежние блоки копируются целиком: view из другого потока видит согласованный уровень
+                grown = max(size, 2 * len(level[0]))
+                for j in (0, 1):
+                    buf = np.empty(grown, dtype=np.int64)
+                    buf[:level[2]] = level[j][:level[2]]
+                    level[j] = buf
+            level[0][changed:size] = lo
+            level[1][changed:size] = hi
+            level[2] = size
+            prev = (level[0], level[1])
+            k += 1
+        return self
+
+    def __len__(self):
+        return len(self.y)
+
+    def _coarsen(self, lo, hi):
+        """Блоки по factor соседних блоков: индексы минимума и максимума по исходному ряду."""
+        m = -(-len(lo) // self.factor)
+        pad = m * self.factor - len(lo)
+        lo_vals = np.concatenate([self.y[lo], np.full(pad, np.inf)]).reshape(m, self.factor)
+        hi_vals = np.concatenate([self.y[hi], np.full(pad, -np.inf)]).reshape(m, self.factor)
+        lo = np.concatenate([lo, np.zeros(pad, dtype=lo.dtype)]).reshape(m, self.factor)
+        hi = np.concatenate([hi, np.zeros(pad, dtype=hi.dtype)]).reshape(m, self.factor)
+        rows = np.arange(m)
+        # NaN (разрывы ряда) не должен «побеждать» в argmin/argmax
+        lo_pick = np.argmin(np.where(np.isnan(lo_vals), np.inf, lo_vals), axis=1)
+        hi_pick = np.argmax(np.where(np.isnan(hi_vals), -np.inf, hi_vals), axis=1)
+        return lo[rows, lo_pick], hi[rows, hi_pick]
+
+    def index_range(self, x0=None, x1=None):
+        """Диапазон индексов [start, stop) для видимого диапазона по оси x (x отсортирован)."""
+        if self._x is None:
+            start = 0 if x0 is None else int(np.clip(np.ceil(x0), 0, len(self.y)))
+            stop = len(self.y) if x1 is None else int(np.clip(np.floor(x1) + 1, 0, len(self.y)))
+            return start, max(start, stop)
+        start = 0 if x0 is None else int(np.searchsorted(self._x, x0, side='left'))
+        stop = len(self.y) if x1 is None else int(np.searchsorted(self._x, x1, side='right'))
+        return start, stop
+
+    def view(self, x0=None, x1=None, max_points=2000):
+        """(x, y) видимого диапазона [x0, x1] не более чем из ~max_points точек."""
+        start, stop = self.index_range(x0, x1)
+        if stop - start <= max_points:
+            return self._xs(np.arange(start, stop)), self.y[start:stop]
+        block = 1
+        for lo, hi in self.levels:
+            block *= self.factor
+            b0, b1 = start // block, -(-stop // block)
+            if 2 * (b1 - b0) <= max_points:
+                break
+        lo, hi = lo[b0:b1], hi[b0:b1]
+        idx = np.empty(2 * len(lo), dtype=np.int64)
+        idx[0::2] = np.minimum(lo, hi)
+        idx[1::2] = np.maximum(lo, hi)
+        idx = idx[(idx >= start) & (idx < stop)]
+        return self._xs(idx), self.y[idx]
+
+    def _xs(self, idx):
+        return idx if self._x is None else self._x[idx]
+
+
+def sleep_markers(times, y_min, y_max, x0=None, x1=None):
+    """
+    Вертикальные отметки сна одной линией: x = [t, t, nan, ...], y = [y_min, y_max, nan, ...].
+    Только отметки в видимом диапазоне [x0, x1].
+    """
+    times = np.asarray(times, dtype=float)
+    if x0 is not None:
+        times = times[times >= x0]
+    if x1 is not None:
+        times = times[times <= x1]
+    x = np.repeat(times, 3)
+    x[2::3] = np.nan
+    y = np.tile([y_min, y_max, np.nan], len(times))
+    return x, y
@@ -0,0 +1,211 @@
+# planet_pattern/halving.py
+"""
+Ранняя остановка перебора: successive halving и Hyperband поверх Simulation.
+
+Плохие конфигурации видны уже через несколько снов, поэтому все точки сначала
+прогоняются на коротком горизонте, и только лучшая доля 1/eta продвигается дальше:
+    ступень i: горизонт n_cycles · eta^-(R-1-i), выживает top len/eta по objective.
+Горизонт каждой точки выравнивается вверх до границы сна (кратно её sleep_every),
+на ней же пишется контрольная точка — продвинутая конфигурация продолжает
+прогон с того же места, а не считает его заново.
+
+objective(sim) → число (больше — лучше): готовые — в OBJECTIVES
+('coherence_mean', 'coherence_recent', 'final_energy', 'energy_mean'),
+либо любая функция уровня модуля (её выполняют воркеры ProcessPoolExecutor).
+
+Каталог (продолжение после прерывания — как у sweep.Sweep):
+    halving.json          — спецификация
+    ckpt/run_XXXXXX.pkl   — контрольные точки живых конфигураций (tmp + os.replace)
+    rung_XX.npz           — итоги ступени: run_id, steps, score
+    final.npz             — сводные метрики выживших (колонки как в sweep)
+"""
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sweep import METRICS, build_simulation, run_seed, summarize
+
+
+def coherence_mean(sim):
+    n = sim.n_checks
+    return float(sim.coherence[:n, 0].mean()) if n else -np.inf
+
+
+def coherence_recent(sim, last=4):
+    n = sim.n_checks
+    return float(sim.coherence[max(0, n - last):n, 0].mean()) if n else -np.inf
+
+
+def final_energy(sim):
+    n = sim.n_checks
+    return float(sim.energy['E'][n - 1, 0]) if n and len(sim.energy) else -np.inf
+
+
+def energy_mean(sim):
+    n = sim.n_checks
+    return float(sim.energy['E'][:n, 0].mean()) if n and len(sim.energy) else -np.inf
+
+
+OBJECTIVES = {
+    'coherence_mean': coherence_mean,
+    'coherence_recent': coherence_recent,
+    'final_energy': final_energy,
+    'energy_mean': energy_mean,
+}
+
+
+def _atomic_dump(obj, fname):
+    tmp = fname + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, fname)
+
+
+def advance_run(ckpt, run_id, params, base_seed, base, fraction, objective):
+    """
+    Выполняется в воркере: поднимает контрольную точку (или строит симуляцию),
+    догоняет горизонт fraction·n_cycles до ближайшей границы сна и сохраняет точку.
+    """
+    if os.path.exists(ckpt):
+        with open(ckpt, 'rb') as f:
+            sim = pickle.load(f)
+    else:
+        sim = build_simulation(params, run_seed(base_seed, run_id), base)
+    cfg = sim.config
+    every = cfg.sleep_every
+    steps = min(cfg.n_cycles, -(-int(np.ceil(fraction * cfg.n_cycles)) // every) * every)
+    if sim.t < steps:
+        sim.advance(steps - sim.t)
+        _atomic_dump(sim, ckpt)
+    return run_id, sim.t, objective(sim), summarize(sim) if sim.done else None
+
+
+class SuccessiveHalving:
+    """
+    points — список словарей параметров (sweep.grid / sweep.random_search);
+    eta — во сколько раз сокращается число точек и растёт горизонт;
+    min_fraction — горизонт первой ступени как доля n_cycles.
+    """
+    def __init__(self, path, points, objective='coherence_mean', eta=3, min_fraction=1/9,
+                 base_seed=0, base=None, run_ids=None):
+        self.path = path
+        self.points = list(points)
+        self.run_ids = list(run_ids) if run_ids is not None else list(range(len(self.points)))
+        self.objective = OBJECTIVES[objective] if isinstance(objective, str) else objective
+        self.eta = eta
+        self.base_seed = int(base_seed)
+        self.base = dict(base or {})
+        n_rungs = max(1, int(round(np.log(1.0 / min_fraction) / np.log(eta))) + 1)
+        self.fractions = [float(eta) ** -(n_rungs - 1 - i) for i in range(n_rungs)]
+        os.makedirs(os.path.join(path, 'ckpt'), exist_ok=True)
+        spec = {
+            'version': 1,
+            'objective': getattr(self.objective, '__name__', str(objective)),
+            'eta': eta,
+            'fractions': self.fractions,
+            'base_seed': self.base_seed,
+            'base': self.base,
+            'run_ids': self.run_ids,
+            'points': self.points,
+        }
+        manifest = os.path.join(path, 'halving.json')
+        if os.path.exists(manifest):
+            with open(manifest, encoding='utf-8') as f:
+                if json.load(f) != json.loads(json.dumps(spec)):
+                    raise ValueError(f"SuccessiveHalving: в {path} уже лежит другой перебор — укажите новый каталог")
+        else:
+            with open(manifest + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(spec, f, ensure_ascii=False, indent=1)
+            os.replace(manifest + '.tmp', manifest)
+
+    def _ckpt(self, run_id):
+        return os.path.join(self.path, 'ckpt', f"run_{run_id:06d}.pkl")
+
+    def _rung(self, i):
+        return os.path.join(self.path, f"rung_{i:02d}.npz")
+
+    def rung(self, i):
+        """Итоги ступени i: {'run_id', 'steps', 'score'} или None, если ступень не завершена."""
+        if not os.path.exists(self._rung(i)):
+            return None
+        with np.load(self._rung(i)) as data:
+            return dict(data)
+
+    def run(self, workers=None, progress=None):
+        """
+        Проходит ступени по очереди; готовые ступени берутся с диска.
+        progress(rung, n_alive, steps_total) — после каждой ступени.
+        Возвращает колонки выживших (как sweep.Sweep.load) с добавленной колонкой score.
+        """
+        index = {run_id: i for i, run_id in enumerate(self.run_ids)}
+        alive = list(self.run_ids)
+        final = None
+        for i, fraction in enumerate(self.fractions):
+            last = i == len(self.fractions) - 1
+            done = self.rung(i)
+            if done is None or last:
+                tasks = [(self._ckpt(r), r, self.points[index[r]], self.base_seed, self.base,
+                          fraction, self.objective) for r in alive]
+                if workers == 1:
+                    outcomes = [advance_run(*task) for task in tasks]
+                else:
+                    with ProcessPoolExecutor(max_workers=workers) as pool:
+                        outcomes = list(pool.map(advance_run, *zip(*tasks)))
+                done = {
+                    'run_id': np.array([o[0] for o in outcomes], dtype=np.int64),
+                    'steps': np.array([o[1] for o in outcomes], dtype=np.int64),
+                    'score': np.array([o[2] for o in outcomes], dtype=float),
+                }
+                with open(self._rung(i) + '.tmp', 'wb') as f:
+                    np.savez(f, **done)
+                os.replace(self._rung(i) + '.tmp', self._rung(i))
+                if last:
+                    final = outcomes
+            if progress:
+                progress(i, len(alive), int(done['steps'].sum()))
+            if last:
+                break
+            keep = max(1, len(alive) // self.eta)
+            order = np.argsort(-done['score'], kind='stable')[:keep]
+            survivors = set(done['run_id'][order].tolist())
+            for r in alive:
+                if r not in survivors and os.path.exists(self._ckpt(r)):
+                    os.remove(self._ckpt(r))
+            alive = [r for r in alive if r in survivors]
+
+        columns = {'run_id': np.array([o[0] for o in final], dtype=np.int64),
+                   'score': np.array([o[2] for o in final], dtype=float)}
+        for name in METRICS:
+            columns[name] = np.array([o[3][name] for o in final], dtype=float)
+        for name in self.points[0]:
+            columns[f'param_{name}'] = np.array([self.points[index[o[0]]][name] for o in final])
+        with open(os.path.join(self.path, 'final.npz.tmp'), 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(os.path.join(self.path, 'final.npz.tmp'), os.path.join(self.path, 'final.npz'))
+        return columns
+
+
+def hyperband(path, points, objective='coherence_mean', eta=3, max_rungs=3, base_seed=0, base=None, workers=None):
+    """
+    Hyperband: точки делятся между скобками s = max_rungs-1 … 0; скобка s — successive
+    halving с s+1 ступенями (агрессивная ранняя остановка ↔ полный горизонт для всех).
+    Доли точек на скобку ∝ eta^s / (s+1), как у Li et al. Возвращает колонки всех финалистов.
+    """
+    brackets = list(range(max_rungs - 1, -1, -1))
+    weights = np.array([eta ** s / (s + 1) for s in brackets], dtype=float)
+    counts = np.floor(weights / weights.sum() * len(points)).astype(int)
+    counts[0] += len(points) - counts.sum()
+    results, start = [], 0
+    for s, n in zip(brackets, counts):
+        if n == 0:
+            continue
+        ids = list(range(start, start + n))
+        sh = SuccessiveHalving(os.path.join(path, f"bracket_{s}"), points[start:start + n],
+                               objective=objective, eta=eta, min_fraction=float(eta) ** -s,
+                               base_seed=base_seed, base=base, run_ids=ids)
+        results.append(sh.run(workers=workers))
+        start += n
+    return {name: np.concatenate([r[name] for r in results]) for name in results[0]}
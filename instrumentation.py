@@ -0,0 +1,210 @@
+# planet_pattern/instrumentation.py
+"""
+Лёгкая инструментация горячих путей: таймеры стадий, счётчики, gauge-метрики.
+
+    from instrumentation import metrics
+    metrics.enable(trace=True)
+    with metrics.span('coherence'):
+        ...
+    metrics.count('memory.windows', 2)
+    metrics.gauge('memory.nbytes', lambda: memory.nbytes)   # вычисляется при экспорте
+
+Выключенный реестр (по умолчанию) отдаёт из span() один общий пустой контекст
+и сразу выходит из count()/gauge() — стоимость порядка одного вызова метода.
+Включить без правки кода: переменная окружения PLANET_PATTERN_METRICS=1
+(=trace — ещё и с записью трассы).
+
+Экспорт:
+    to_dict() / write_json(path)  — машиночитаемый снимок
+    to_prometheus()               — текстовый формат Prometheus (exposition format)
+    write_chrome_trace(path)      — трасса прогона для chrome://tracing / Perfetto
+"""
+import json
+import math
+import os
+import threading
+import time
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('registry', 'name', 'start')
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry._record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Instrumentation:
+    """
+    Реестр метрик. timers: имя → [count, total_ns, min_ns, max_ns];
+    counters: имя → число; gauges: имя → число или функция без аргументов.
+    Трасса (если включена) хранит не более max_events последних отрезков.
+    """
+    def __init__(self, enabled=False, trace=False, max_events=1_000_000):
+        self.enabled = enabled
+        self.trace = trace
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self, trace=False):
+        self.enabled = True
+        self.trace = trace
+        return self
+
+    def disable(self):
+        self.enabled = False
+        return self
+
+    def reset(self):
+        with self._lock:
+            self.timers = {}
+            self.counters = {}
+            self.gauges = {}
+            self.events = []
+            self._origin = time.perf_counter_ns()
+            self._dropped = 0
+
+    # --- сбор ------------------------------------------------------------
+
+    def span(self, name):
+        """Контекст-таймер стадии name."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def _record(self, name, start, stop):
+        dt = stop - start
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, dt, dt, dt]
+            else:
+                timer[0] += 1
+                timer[1] += dt
+                if dt < timer[2]:
+                    timer[2] = dt
+                if dt > timer[3]:
+                    timer[3] = dt
+            if self.trace:
+                if len(self.events) < self.max_events:
+                    self.events.append((name, start, dt, threading.get_ident()))
+                else:
+                    self._dropped += 1
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        """Значение или функция без аргументов (вычисляется при экспорте)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[name] = value
+
+    # --- экспорт ---------------------------------------------------------
+
+    def _gauge_values(self):
+        out = {}
+        for name, value in self.gauges.items():
+            try:
+                out[name] = float(value() if callable(value) else value)
+            except Exception:     # gauge не должен ронять экспорт
+                out[name] = float('nan')
+        return out
+
+    def to_dict(self):
+        with self._lock:
+            timers = {
+                name: {
+                    'count': count,
+                    'total_s': total / 1e9,
+                    'mean_s': total / count / 1e9,
+                    'min_s': lo / 1e9,
+                    'max_s': hi / 1e9,
+                }
+                for name, (count, total, lo, hi) in self.timers.items()
+            }
+            counters = dict(self.counters)
+            gauges = self._gauge_values()
+            dropped = self._dropped
+        return {'timers': timers, 'counters': counters, 'gauges': gauges, 'trace_dropped': dropped}
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+
+    def to_prometheus(self, prefix='planet_pattern'):
+        snap = self.to_dict()
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Суммарное время стадии.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {t["total_s"]:.9g}'
+                  for name, t in snap['timers'].items()]
+        lines += [f"# HELP {prefix}_stage_calls_total Число вызовов стадии.",
+                  f"# TYPE {prefix}_stage_calls_total counter"]
+        lines += [f'{prefix}_stage_calls_total{{stage="{name}"}} {t["count"]}'
+                  for name, t in snap['timers'].items()]
+        for name, value in snap['counters'].items():
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, value in snap['gauges'].items():
+            metric = f"{prefix}_{_metric_name(name)}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {_prom_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+    def chrome_trace(self):
+        """Список событий Trace Event Format (ph='X', время в микросекундах)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            origin = self._origin
+        return [{'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                 'ts': (start - origin) / 1e3, 'dur': dur / 1e3}
+                for name, start, dur, tid in events]
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.chrome_trace(), 'displayTimeUnit': 'ms'}, f)
+
+
+def _metric_name(name):
+    return ''.join(c if c.isalnum() else '_' for c in name)
+
+
+def _prom_value(value):
+    """Число в exposition format: нечисловые значения — NaN, +Inf, -Inf (а не nan/inf Python)."""
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return f"{value:.9g}"
+
+
+_env = os.environ.get('PLANET_PATTERN_METRICS', '')
+metrics = Instrumentation(enabled=_env not in ('', '0'), trace=_env == 'trace')
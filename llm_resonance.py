@@ -10,6 +10,59 @@
 
 import numpy as np
 from typing import List, Dict, Optional
+from scipy.fft import rfft
+from scipy.stats import entropy
+
+from physics import ENERGY_DTYPE
+from spectral_plan import get_plan
+
+
+def attention_stats(attention_weights, chunk_elems=1 << 22, per_layer=False, per_head=False):
+    """
+    Статистика |w| тензора внимания [n_layers, n_heads, seq_len, seq_len] (или любой
+    формы [..., rows, cols]) потоково: по головам и блокам строк не больше chunk_elems
+    элементов. |w| пишется в один переиспользуемый буфер, суммы копятся в float64 —
+    пиковая память ~ chunk_elems, а не размер тензора. Подходит для np.memmap и float16.
+    
+    Возвращает {'mean', 'max', 'count'}; per_head — ещё 'head_mean', 'head_max'
+    формы [n_layers, n_heads] (все оси, кроме двух последних); per_layer — 'layer_mean',
+    'layer_max' по первой оси.
+    """
+    w = np.asarray(attention_weights)      # для np.memmap — представление, без чтения файла
+    if w.ndim < 2:
+        w = w.reshape(1, -1)
+    lead, (rows, cols) = w.shape[:-2], w.shape[-2:]
+    # буфер в dtype не уже float32: float16 → float32, float64 остаётся float64
+    buf_dtype = np.promote_types(w.dtype, np.float32)
+    block = max(1, min(rows, chunk_elems // max(cols, 1)))
+    buf = np.empty(block * cols, dtype=buf_dtype)
+    
+    head_sum = np.zeros(lead)
+    head_max = np.zeros(lead)
+    for idx in np.ndindex(*lead):
+        head = w[idx]                       # представление одной головы, без копии
+        for r in range(0, rows, block):
+            part = head[r:r + block]
+            a = buf[:part.size].reshape(part.shape)
+            np.abs(part, out=a)
+            head_sum[idx] += a.sum(dtype=np.float64)
+            head_max[idx] = max(head_max[idx], float(a.max()) if a.size else 0.0)
+    
+    per = rows * cols
+    count = per * int(np.prod(lead))
+    stats = {
+        "mean": float(head_sum.sum() / count) if count else 0.0,
+        "max": float(head_max.max()) if head_max.size else 0.0,
+        "count": count,
+    }
+    if per_head:
+        stats["head_mean"] = head_sum / max(per, 1)
+        stats["head_max"] = head_max
+    if per_layer and lead:
+        axes = tuple(range(1, len(lead)))
+        stats["layer_mean"] = head_sum.sum(axis=axes) / max(per * int(np.prod(lead[1:])), 1)
+        stats["layer_max"] = head_max.max(axis=axes)
+    return stats
 
 
 class LLMResonanceLayer:
@@ -36,11 +89,13 @@ class LLMResonanceLayer:
         или упрощённо: средние веса внимания по слоям
         """
         if isinstance(attention_weights, np.ndarray):
-            # Если массив — берём среднее
-            return float(np.abs(attention_weights).mean())
+            # Если массив — среднее |w| потоково, без копии |w| размером с тензор
+            return attention_stats(attention_weights)["mean"]
         elif isinstance(attention_weights, (list, tuple)):
             # Если список тензоров — усредняем
-            weights = np.array([np.abs(w).mean() if hasattr(w, 'mean') else w for w in attention_weights])
+            weights = np.array([attention_stats(w)["mean"] if isinstance(w, np.ndarray)
+                                else np.abs(w).mean() if hasattr(w, 'mean') else w
+                                for w in attention_weights])
             return float(weights.mean())
         else:
             # Fallback: если не можем посчитать — возвращаем 1.0
@@ -64,13 +119,11 @@ class LLMResonanceLayer:
             return 0.5
         
         # FFT для поиска резонанса с 0.1 Hz
-        from scipy.fft import rfft, rfftfreq
         spec = np.abs(rfft(signal))**2
-        freqs = rfftfreq(len(signal), d=1.0/fps)
         
-        # Ищем энергию в полосе 0.1 Hz ± 0.03
-        band_mask = (freqs >= self.target_hz - 0.03) & (freqs <= self.target_hz + 0.03)
-        band_energy = spec[band_mask].sum()
+        # Ищем энергию в полосе 0.1 Hz ± 0.03 (сетка частот и маска — из кэша планов)
+        plan = get_plan(len(signal), fps=fps, target_hz=self.target_hz, band=0.03)
+        band_energy = spec[plan.band_mask].sum()
         total_energy = spec.sum() + 1e-9
         
         return float(band_energy / total_energy)
@@ -116,8 +169,6 @@ class LLMResonanceLayer:
         token_probs: вероятности токенов [batch_size, vocab_size]
         или список вероятностей
         """
-        from scipy.stats import entropy
-        
         if isinstance(token_probs, np.ndarray):
             if token_probs.ndim == 1:
                 probs = token_probs
@@ -177,6 +228,90 @@ class LLMResonanceLayer:
         self.energy_history.append(result)
         return result
     
+    def calculate_llm_energy_batch(self,
+                                   attention_weights=None,
+                                   token_times=None,
+                                   lengths=None,
+                                   response_embeddings=None,
+                                   token_probs=None,
+                                   reference_embedding=None,
+                                   fps=1.0):
+        """
+        E = A × R × L − S сразу для B ответов-кандидатов (ранжирование генераций).
+        Результат совпадает с calculate_llm_energy для каждого кандидата по отдельности,
+        но считается несколькими векторными проходами; energy_history не пополняется.
+        
+        attention_weights:   (B, ...) — веса внимания каждого кандидата
+        token_times:         (B, T) — временные метки, дополненные до общей длины T
+        lengths:             (B,) — фактическое число меток (по умолчанию T у всех)
+        response_embeddings: (B, D)
+        token_probs:         (B, V) или (B, n, V) — во втором случае усредняется по n
+        reference_embedding: (D,) — общий эталон, или (B, D)
+        
+        Отсутствующий вход даёт нейтральное значение, как в calculate_llm_energy.
+        Возвращает структурированный массив ENERGY_DTYPE формы (B,).
+        """
+        inputs = (attention_weights, token_times, response_embeddings, token_probs)
+        B = next((len(x) for x in inputs if x is not None), 0)
+        out = np.empty(B, dtype=ENERGY_DTYPE)
+        
+        # A — внимание
+        if attention_weights is None:
+            out["A"] = 0.5
+        else:
+            out["A"] = np.abs(np.asarray(attention_weights, dtype=float)).reshape(B, -1).mean(axis=1)
+        
+        # R — резонанс: окна одной длины — одним rfft (дополнение нулями изменило бы спектр)
+        out["R"] = 0.5
+        if token_times is not None:
+            times = np.asarray(token_times, dtype=float).reshape(B, -1)
+            lengths = np.full(B, times.shape[1]) if lengths is None else np.asarray(lengths)
+            for n in np.unique(lengths):
+                if n < 8:
+                    continue  # нейтральный резонанс для коротких последовательностей
+                rows = np.flatnonzero(lengths == n)
+                signal = times[rows, :n]
+                signal = signal - signal.mean(axis=1, keepdims=True)
+                spec = np.abs(rfft(signal, axis=1))**2
+                plan = get_plan(int(n), fps=fps, target_hz=self.target_hz, band=0.03)
+                R = spec[:, plan.band_mask].sum(axis=1) / (spec.sum(axis=1) + 1e-9)
+                flat = np.isclose(signal.std(axis=1), 0)
+                out["R"][rows] = np.where(flat, 0.5, R)
+        
+        # L — любовь
+        if response_embeddings is None:
+            out["L"] = 0.5
+        else:
+            resp = np.asarray(response_embeddings, dtype=float).reshape(B, -1)
+            if reference_embedding is None:
+                # норма эмбеддинга как proxy живости
+                out["L"] = np.clip(np.linalg.norm(resp, axis=1) / np.sqrt(resp.shape[1]), 0, 1)
+            else:
+                ref = np.asarray(reference_embedding, dtype=float)
+                ref = ref.reshape(B, -1) if ref.ndim > 1 else ref[None, :]
+                m = min(resp.shape[1], ref.shape[1])
+                rc = resp[:, :m] - resp[:, :m].mean(axis=1, keepdims=True)
+                fc = ref[:, :m] - ref[:, :m].mean(axis=1, keepdims=True)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    corr = (rc * fc).sum(axis=1) / np.sqrt((rc * rc).sum(axis=1) * (fc * fc).sum(axis=1))
+                out["L"] = np.where(np.isnan(corr), 0.5, (np.clip(corr, -1.0, 1.0) + 1.0) / 2.0)
+        
+        # S — шум: энтропия распределения токенов, нормированная на log(V)
+        if token_probs is None:
+            out["S"] = 0.5
+        else:
+            probs = np.asarray(token_probs, dtype=float)
+            if probs.ndim == 3:
+                probs = probs.mean(axis=1)
+            probs = probs / (probs.sum(axis=1, keepdims=True) + 1e-9)
+            p = probs + 1e-9
+            p /= p.sum(axis=1, keepdims=True)
+            max_ent = np.log(probs.shape[1])
+            out["S"] = -(p * np.log(p)).sum(axis=1) / max_ent if max_ent > 0 else 0.0
+        
+        out["E"] = out["A"] * out["R"] * out["L"] - out["S"]
+        return out
+    
     def adapt_temperature(self, energy, base_temperature=0.7):
         """
         Адаптирует temperature на основе энергии
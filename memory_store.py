@@ -0,0 +1,306 @@
+# planet_pattern/memory_store.py
+"""
+Постоянное хранилище волновой памяти на диске.
+
+Каталог хранилища:
+    manifest.json        — схема, число зафиксированных записей в каждом сегменте
+                           и номер записи самого старого окна (first_id)
+    seg_XXXXXX.coeffs    — записи коэффициентов фиксированной ширины (coeff_len × dtype)
+    seg_XXXXXX.meta      — колонки метаданных (t, код фазы, id агента), META_DTYPE
+
+Сегменты только дописываются и открываются через np.memmap: чтение — представления
+без копирования, поэтому память из десятков миллионов окон открывается мгновенно.
+Надёжность при сбое: данные сначала дописываются и сбрасываются на диск, затем
+атомарно (tmp + os.replace) переписывается манифест. Всё, что лежит в файле за
+границей зафиксированного числа записей, при открытии отбрасывается.
+"""
+import json
+import os
+
+import numpy as np
+
+
+META_DTYPE = np.dtype([('t', '<i8'), ('phase', 'i1'), ('agent', '<i4')])
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def _fsync_dir(path):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WaveletStore:
+    def __init__(self, path, coeff_len=None, dtype='float64', segment_windows=1 << 20,
+                 attrs=None, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._maps = {}
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != FORMAT_VERSION:
+                raise ValueError(f"WaveletStore: неподдерживаемая версия формата {manifest.get('version')!r}")
+            self.coeff_len = manifest['coeff_len']
+            self.dtype = np.dtype(manifest['dtype'])
+            self.segment_windows = manifest['segment_windows']
+            self.attrs = manifest.get('attrs', {})
+            self.agent_ids = manifest.get('agent_ids', {})
+            self.segments = manifest['segments']        # [{'name': ..., 'count': ...}]
+            self._next_segment = manifest['next_segment']
+            self.first_id = manifest.get('first_id', 0)  # номер записи самого старого окна
+            if coeff_len is not None and coeff_len != self.coeff_len:
+                raise ValueError(f"WaveletStore: в хранилище coeff_len={self.coeff_len}, запрошено {coeff_len}")
+            if attrs:
+                for key, value in attrs.items():
+                    if key in self.attrs and self.attrs[key] != value:
+                        raise ValueError(f"WaveletStore: {key}={self.attrs[key]!r} в хранилище, запрошено {value!r}")
+            if not readonly:
+                self._truncate_tails()
+        else:
+            if readonly:
+                raise FileNotFoundError(manifest_path)
+            if coeff_len is None:
+                raise ValueError("WaveletStore: для нового хранилища нужен coeff_len")
+            os.makedirs(path, exist_ok=True)
+            self.coeff_len = int(coeff_len)
+            self.dtype = np.dtype(dtype)
+            self.segment_windows = int(segment_windows)
+            self.attrs = dict(attrs or {})
+            self.agent_ids = {}
+            self.segments = []
+            self._next_segment = 0
+            self.first_id = 0
+            self._commit()
+
+    # --- служебное -------------------------------------------------------
+
+    @property
+    def _row_bytes(self):
+        return self.coeff_len * self.dtype.itemsize
+
+    def _file(self, name, kind):
+        return os.path.join(self.path, f"{name}.{kind}")
+
+    def _commit(self):
+        """Атомарно фиксирует манифест — точка восстановления после сбоя."""
+        manifest = {
+            'version': FORMAT_VERSION,
+            'coeff_len': self.coeff_len,
+            'dtype': self.dtype.str,
+            'segment_windows': self.segment_windows,
+            'attrs': self.attrs,
+            'agent_ids': self.agent_ids,
+            'segments': self.segments,
+            'next_segment': self._next_segment,
+            'first_id': self.first_id,
+        }
+        tmp = os.path.join(self.path, MANIFEST + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+        _fsync_dir(self.path)
+
+    def _truncate_tails(self):
+        """Отрезает недописанные хвосты сегментов (запись прервалась до фиксации манифеста)."""
+        for seg in self.segments:
+            for kind, width in (('coeffs', self._row_bytes), ('meta', META_DTYPE.itemsize)):
+                fname = self._file(seg['name'], kind)
+                size = seg['count'] * width
+                if os.path.getsize(fname) > size:
+                    with open(fname, 'r+b') as f:
+                        f.truncate(size)
+
+    def _new_segment(self):
+        name = f"seg_{self._next_segment:06d}"
+        self._next_segment += 1
+        for kind in ('coeffs', 'meta'):
+            open(self._file(name, kind), 'wb').close()
+        seg = {'name': name, 'count': 0}
+        self.segments.append(seg)
+        return seg
+
+    def _views(self, seg):
+        """Представления memmap сегмента (coeffs, meta) на зафиксированные записи."""
+        key = (seg['name'], seg['count'])
+        views = self._maps.get(seg['name'])
+        if views is None or views[0] != key:
+            n = seg['count']
+            if n == 0:
+                coeffs = np.empty((0, self.coeff_len), dtype=self.dtype)
+                meta = np.empty(0, dtype=META_DTYPE)
+            else:
+                coeffs = np.memmap(self._file(seg['name'], 'coeffs'), dtype=self.dtype,
+                                   mode='r', shape=(n, self.coeff_len))
+                meta = np.memmap(self._file(seg['name'], 'meta'), dtype=META_DTYPE, mode='r', shape=(n,))
+            views = (key, coeffs, meta)
+            self._maps[seg['name']] = views
+        return views[1], views[2]
+
+    # --- запись ----------------------------------------------------------
+
+    def append(self, packed, t=-1, phase=-1, agent=-1):
+        """Дописывает окна packed (n, coeff_len); t/phase/agent — скаляры или массивы (n,)."""
+        if self.readonly:
+            raise PermissionError("WaveletStore: хранилище открыто только для чтения")
+        packed = np.ascontiguousarray(np.atleast_2d(packed), dtype=self.dtype)
+        n = len(packed)
+        if packed.shape[1] != self.coeff_len:
+            raise ValueError(f"WaveletStore.append: ожидается {self.coeff_len} коэффициентов, получено {packed.shape[1]}")
+        meta = np.empty(n, dtype=META_DTYPE)
+        meta['t'], meta['phase'], meta['agent'] = t, phase, agent
+        saved = self._state()
+        try:
+            self._append_rows(packed, meta)
+            self._commit()
+        except BaseException:
+            self._rollback(saved)
+            raise
+        return n
+
+    def _state(self):
+        """Снимок списка сегментов (до записи) для отката."""
+        return [dict(seg) for seg in self.segments], self._next_segment, self.first_id
+
+    def _rollback(self, saved):
+        """
+        Возврат к снимку _state после неудачной записи: счётчики сегментов снова
+        совпадают с зафиксированным манифестом, недописанные хвосты отрезаются,
+        файлы созданных сегментов удаляются.
+        """
+        segments, next_segment, first_id = saved
+        known = {seg['name'] for seg in segments}
+        created = [seg['name'] for seg in self.segments if seg['name'] not in known]
+        self.segments, self._next_segment, self.first_id = segments, next_segment, first_id
+        for name in created:
+            self._maps.pop(name, None)
+        try:
+            self._truncate_tails()
+            for name in created:
+                for kind in ('coeffs', 'meta'):
+                    if os.path.exists(self._file(name, kind)):
+                        os.remove(self._file(name, kind))
+        except OSError:      # хвосты всё равно отрежет следующее открытие
+            pass
+
+    def compact(self, max_windows=None):
+        """
+        Явная компактизация: оставляет последние max_windows окон (или все),
+        переписывает их в плотные сегменты по segment_windows и удаляет старые файлы.
+        Старые сегменты удаляются только после фиксации нового манифеста и после того,
+        как хранилище отпустило свои memmap-представления на них; представления,
+        полученные раньше через coefficients/iter_segments, вызывающий должен отпустить сам.
+        """
+        if self.readonly:
+            raise PermissionError("WaveletStore: хранилище открыто только для чтения")
+        total = len(self)
+        start = 0 if max_windows is None else max(0, total - max_windows)
+        saved = self._state()
+        old = self.segments
+        self.segments = []
+        # номера записей выживших окон сохраняются: отрезанные окна сдвигают first_id
+        # в том же манифесте, что и новый список сегментов
+        self.first_id += start
+        try:
+            pos = 0
+            for seg in old:
+                lo = max(0, start - pos)
+                pos += seg['count']
+                if lo >= seg['count']:
+                    continue
+                coeffs, meta = self._views(seg)
+                self._append_rows(coeffs[lo:], meta[lo:])
+                del coeffs, meta
+            self._commit()
+        except BaseException:
+            self._rollback(saved)
+            raise
+        for seg in old:
+            self._maps.pop(seg['name'], None)
+        for seg in old:
+            for kind in ('coeffs', 'meta'):
+                os.remove(self._file(seg['name'], kind))
+        return len(self)
+
+    def _append_rows(self, coeffs, meta):
+        """Дописывает строки в хвостовые сегменты (без фиксации манифеста)."""
+        done = 0
+        while done < len(coeffs):
+            seg = self.segments[-1] if self.segments and self.segments[-1]['count'] < self.segment_windows \
+                else self._new_segment()
+            chunk = min(len(coeffs) - done, self.segment_windows - seg['count'])
+            for kind, data in (('coeffs', coeffs[done:done + chunk]), ('meta', meta[done:done + chunk])):
+                with open(self._file(seg['name'], kind), 'ab') as f:
+                    f.write(np.ascontiguousarray(data).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            seg['count'] += chunk
+            done += chunk
+
+    # --- чтение ----------------------------------------------------------
+
+    def __len__(self):
+        return sum(seg['count'] for seg in self.segments)
+
+    @property
+    def total_pushed(self):
+        """Сколько окон записано за всю жизнь хранилища (включая отрезанные compact)."""
+        return self.first_id + len(self)
+
+    def storage_ids(self):
+        """Номера записей хранимых окон (стабильны при compact и переоткрытии)."""
+        return np.arange(self.first_id, self.total_pushed)
+
+    @property
+    def nbytes(self):
+        return len(self) * (self._row_bytes + META_DTYPE.itemsize)
+
+    def iter_segments(self):
+        """(coeffs, meta) каждого сегмента — memmap-представления без копирования."""
+        for seg in self.segments:
+            if seg['count']:
+                yield self._views(seg)
+
+    def coefficients(self, start=0, stop=None):
+        """Окна [start, stop): представление, если диапазон внутри одного сегмента, иначе склейка."""
+        return self._range(start, stop, 0)
+
+    def metadata(self, start=0, stop=None):
+        meta = self._range(start, stop, 1)
+        return {name: meta[name] for name in META_DTYPE.names}
+
+    def _range(self, start, stop, which):
+        total = len(self)
+        stop = total if stop is None else min(stop, total)
+        parts = []
+        pos = 0
+        for seg in self.segments:
+            n = seg['count']
+            lo, hi = max(start - pos, 0), min(stop - pos, n)
+            if lo < hi:
+                parts.append(self._views(seg)[which][lo:hi])
+            pos += n
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return np.empty((0, self.coeff_len), dtype=self.dtype) if which == 0 else np.empty(0, dtype=META_DTYPE)
+        return np.concatenate(parts)
+
+    def take(self, indices):
+        """Выборка окон по глобальным индексам (копия)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        bounds = np.cumsum([0] + [seg['count'] for seg in self.segments])
+        out = np.empty((len(indices), self.coeff_len), dtype=self.dtype)
+        which = np.searchsorted(bounds, indices, side='right') - 1
+        for s in np.unique(which):
+            sel = which == s
+            out[sel] = self._views(self.segments[s])[0][indices[sel] - bounds[s]]
+        return out
@@ -0,0 +1,90 @@
+# planet_pattern/noise_stream.py
+"""
+Собственный источник шума агента.
+
+Каждый агент держит свой numpy.random.Generator (PCG64) и не трогает глобальный
+np.random: живой и фиксированный агенты больше не связаны общим состоянием,
+а прогоны в параллельных процессах воспроизводимы по seed.
+
+Нормальные числа вытягиваются блоками по block штук и раздаются из буфера,
+буфер доливается лениво. Последовательность стандартных нормальных величин
+у Generator не зависит от размера запросов, поэтому блочная выдача совпадает
+с поштучной бит-в-бит.
+
+Состояние сериализуемо (JSON): состояние битового генератора на начало
+текущего буфера («якорь») + сколько чисел из буфера уже выдано.
+"""
+import numpy as np
+
+
+def spawn_seeds(seed, n):
+    """n независимых дочерних SeedSequence из одного seed (для агентов / воркеров)."""
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return root.spawn(n)
+
+
+class NoiseStream:
+    def __init__(self, seed=None, block=4096):
+        self.block = int(block)
+        self._rng = np.random.Generator(np.random.PCG64(seed))
+        self._buf = np.empty(0)
+        self._pos = 0
+        self._anchor = self._rng.bit_generator.state
+        # якорь предыдущего буфера — чтобы можно было «вернуть» недавно выданные числа
+        self._prev = None
+
+    def _refill(self, need=0):
+        self._prev = (self._anchor, len(self._buf))
+        self._anchor = self._rng.bit_generator.state
+        self._buf = self._rng.standard_normal(max(self.block, need))
+        self._pos = 0
+
+    def draw(self, n):
+        """n стандартных нормальных чисел (массив; внутри буфера — представление без копии)."""
+        end = self._pos + n
+        if end <= len(self._buf):
+            out = self._buf[self._pos:end]
+            self._pos = end
+            return out
+        head = self._buf[self._pos:]
+        self._refill(n - len(head))
+        tail = self.draw(n - len(head))
+        return np.concatenate([head, tail]) if len(head) else tail
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        """Как Generator.normal: size=None → float, иначе массив."""
+        if size is None:
+            if self._pos >= len(self._buf):
+                self._refill()
+            z = self._buf[self._pos]
+            self._pos += 1
+            return loc + scale * float(z)
+        return loc + scale * self.draw(int(np.prod(size))).reshape(size)
+
+    # --- сериализация ----------------------------------------------------
+
+    def state(self, rewind=0):
+        """
+        JSON-совместимое состояние. rewind — сколько последних выданных чисел
+        считать невыданными (не больше размера одного блока).
+        """
+        offset = self._pos - rewind
+        anchor = self._anchor
+        if offset < 0:
+            if self._prev is None or self._prev[1] + offset < 0:
+                raise ValueError("NoiseStream.state: нельзя вернуть больше одного блока")
+            anchor, offset = self._prev[0], self._prev[1] + offset
+        return {'bit_generator': anchor, 'offset': int(offset), 'block': self.block}
+
+    def set_state(self, state):
+        self.block = int(state['block'])
+        self._rng.bit_generator.state = state['bit_generator']
+        self._anchor = self._rng.bit_generator.state
+        self._buf = self._rng.standard_normal(max(self.block, state['offset']))
+        self._pos = int(state['offset'])
+        self._prev = None
+        return self
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(block=state['block']).set_state(state)
@@ -0,0 +1,61 @@
+# planet_pattern/pattern_index.py
+"""
+Приближённый индекс похожих окон памяти: LSH на случайных проекциях (NumPy).
+
+Каждая из n_tables таблиц хеширует центрированный вектор коэффициентов в n_bits
+знаков случайных проекций. Коды хранятся отсортированными, поэтому корзина
+находится бинарным поиском за O(log n). Кандидаты затем точно ранжируются
+по евклидову расстоянию на стороне WaveletMemory.
+"""
+import numpy as np
+
+
+class RandomProjectionLSH:
+    def __init__(self, dim, n_bits=12, n_tables=4, seed=0):
+        if not 1 <= n_bits <= 32:
+            raise ValueError("RandomProjectionLSH: n_bits должно быть в диапазоне 1..32")
+        self.dim = dim
+        self.n_bits = n_bits
+        self.n_tables = n_tables
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((dim, n_tables * n_bits))
+        self._weights = (np.uint64(1) << np.arange(n_bits, dtype=np.uint64))
+        self.center = np.zeros(dim)
+        self._codes = None   # (n_tables, n) — отсортированные коды
+        self._ids = None     # (n_tables, n) — id строк в том же порядке
+
+    def hash(self, X):
+        """Коды (n, n_tables) для строк X."""
+        X = np.atleast_2d(X) - self.center
+        bits = (X @ self._planes > 0).reshape(len(X), self.n_tables, self.n_bits)
+        return (bits * self._weights).sum(axis=-1).astype(np.uint32)
+
+    def build(self, X, ids):
+        """Строит таблицы по матрице X (n, dim); ids — внешние идентификаторы строк."""
+        X = np.asarray(X, dtype=float)
+        ids = np.asarray(ids)
+        self.center = X.mean(axis=0) if len(X) else np.zeros(self.dim)
+        codes = self.hash(X).T                       # (n_tables, n)
+        order = np.argsort(codes, axis=1, kind='stable')
+        self._codes = np.take_along_axis(codes, order, axis=1)
+        self._ids = ids[order]
+        return self
+
+    def __len__(self):
+        return 0 if self._codes is None else self._codes.shape[1]
+
+    def candidates(self, q):
+        """id строк, попавших хотя бы в одну корзину запроса q."""
+        if self._codes is None:
+            return np.zeros(0, dtype=np.int64)
+        q_codes = self.hash(q)[0]
+        found = []
+        for table in range(self.n_tables):
+            row = self._codes[table]
+            lo = np.searchsorted(row, q_codes[table], side='left')
+            hi = np.searchsorted(row, q_codes[table], side='right')
+            if hi > lo:
+                found.append(self._ids[table, lo:hi])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
@@ -8,9 +8,17 @@ L — любовь (корреляция с дыханием)
 S — шум (энтропия спектра)
 """
 import numpy as np
-from scipy.fft import rfft, rfftfreq
+from scipy.fft import rfft
 from scipy.stats import entropy
 
+from resonance import coherence_score
+from rhythm import BreathClock
+from spectral_plan import get_plan
+
+
+# Структурированный результат пакетного расчёта энергии
+ENERGY_DTYPE = np.dtype([("A", float), ("R", float), ("L", float), ("S", float), ("E", float)])
+
 
 def calculate_attention(signal):
     """A — внимание: интенсивность сигнала"""
@@ -19,7 +27,6 @@ def calculate_attention(signal):
 
 def calculate_resonance(signal, fps=1.0, target_hz=0.1, band=0.03):
     """R — резонанс: коэффициент когерентности в полосе 0.1 Гц"""
-    from resonance import coherence_score
     return coherence_score(signal, fps=fps, target_hz=target_hz, band=band) / 100.0
 
 
@@ -54,31 +61,78 @@ def calculate_entropy(signal):
     return float(ent / max_ent) if max_ent > 0 else 0.0
 
 
+def energy_kernel(signals, reference_wave=None, fps=1.0, target_hz=0.1, band=0.03):
+    """
+    Слитый расчёт E = A × R × L − S: один rfft центрированного окна даёт и R, и S,
+    а L считается скалярным произведением центрированных векторов вместо np.corrcoef.
+
+    signals: 1D окно (L,) или пакет окон (n_windows, L).
+    reference_wave: None (чистая волна 0.1 Гц), 1D эталон — общий для всех окон,
+    или 2D (n_windows, L_ref). При разной длине обрезается до общей, как в calculate_love.
+
+    Возвращает структурированный массив ENERGY_DTYPE формы () или (n_windows,).
+    """
+    x = np.asarray(signals, dtype=float)
+    single = x.ndim == 1
+    x = np.atleast_2d(x)
+    n, length = x.shape
+
+    # план (сетка частот, маска полосы, эталон) строится только для окон длины ≥ 8:
+    # для коротких и пустых окон работает защита ниже, а rfftfreq(0) делит на ноль
+    plan = get_plan(length, fps=fps, target_hz=target_hz, band=band) if length >= 8 else None
+    if reference_wave is None:
+        # Если нет эталонной волны, используем чистую 0.1 Гц (кэшированную)
+        reference_wave = plan.reference_wave if plan is not None else BreathClock().target_wave(length, fps=fps)
+    ref = np.asarray(reference_wave, dtype=float)
+
+    out = np.empty(n, dtype=ENERGY_DTYPE)
+    out["A"] = np.abs(x).mean(axis=1)
+
+    xc = x - x.mean(axis=1, keepdims=True)
+
+    # R и S — из одного спектра
+    if length < 8:
+        out["R"] = 0.0
+        out["S"] = 1.0  # максимальная энтропия при отсутствии сигнала
+    else:
+        spec = np.abs(rfft(xc, axis=1))**2
+        total = spec.sum(axis=1)
+        out["R"] = spec[:, plan.band_index].sum(axis=1) / (total + 1e-9)
+
+        # энтропия: p = spec / Σspec, затем scipy-нормализация (p + 1e-9) / Σ(p + 1e-9)
+        p = spec / (total + 1e-9)[:, None]
+        p += 1e-9
+        p /= p.sum(axis=1, keepdims=True)
+        max_ent = np.log(spec.shape[1])
+        out["S"] = -(p * np.log(p)).sum(axis=1) / max_ent if max_ent > 0 else 0.0
+
+        flat = np.sqrt((xc * xc).mean(axis=1)) <= 1e-8  # как np.allclose(x.std(), 0)
+        out["R"][flat] = 0.0
+        out["S"][flat] = 1.0
+
+    # L — корреляция через скалярные произведения центрированных векторов
+    m = min(length, ref.shape[-1])
+    sc = x[:, :m] - x[:, :m].mean(axis=1, keepdims=True)
+    rc = np.atleast_2d(ref[..., :m])
+    rc = rc - rc.mean(axis=1, keepdims=True)
+    num = (sc * rc).sum(axis=1)
+    den = np.sqrt((sc * sc).sum(axis=1) * (rc * rc).sum(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.clip(num / den, -1.0, 1.0)
+    # Нормализуем [-1, 1] → [0, 1]; вырожденная корреляция (nan) → 0, как в calculate_love
+    out["L"] = np.where(np.isnan(corr), 0.0, (corr + 1.0) / 2.0)
+
+    out["E"] = out["A"] * out["R"] * out["L"] - out["S"]
+    return out[0] if single else out
+
+
 def calculate_energy(signal, reference_wave=None, fps=1.0):
     """
     E = A × R × L − S
     
     Возвращает словарь с компонентами и итоговой энергией.
+    Считается через energy_kernel (один FFT на окно).
     """
-    A = calculate_attention(signal)
-    R = calculate_resonance(signal, fps=fps)
-    
-    if reference_wave is None:
-        # Если нет эталонной волны, используем чистую 0.1 Гц
-        from rhythm import BreathClock
-        clock = BreathClock()
-        reference_wave = clock.target_wave(len(signal), fps=fps)
-    
-    L = calculate_love(signal, reference_wave)
-    S = calculate_entropy(signal)
-    
-    E = A * R * L - S
-    
-    return {
-        "A": A,
-        "R": R,
-        "L": L,
-        "S": S,
-        "E": E,
-    }
+    res = energy_kernel(signal, reference_wave=reference_wave, fps=fps)
+    return {name: float(res[name]) for name in ENERGY_DTYPE.names}
 
@@ -1,6 +1,9 @@
 # planet_pattern/resonance.py
 import numpy as np
-from scipy.fft import rfft, rfftfreq
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft
+
+from spectral_plan import get_plan
 
 
 def coherence_score(signal, fps=1.0, target_hz=0.1, band=0.03):
@@ -12,9 +15,160 @@ def coherence_score(signal, fps=1.0, target_hz=0.1, band=0.03):
     if len(x) < 8 or np.allclose(x.std(), 0):
         return 0.0
     spec = np.abs(rfft(x))**2
-    freqs = rfftfreq(len(x), d=1.0/fps)
-    mask = (freqs >= target_hz - band) & (freqs <= target_hz + band)
-    band_energy = spec[mask].sum()
+    plan = get_plan(len(x), fps=fps, target_hz=target_hz, band=band)
+    band_energy = spec[plan.band_mask].sum()
     total = spec.sum() + 1e-9
     return float(100.0 * band_energy / total)  # в процентах
 
+
+def coherence_scores(signals, fps=1.0, target_hz=0.1, band=0.03, window=None, hop=None):
+    """
+    Пакетная когерентность: один rfft по оси окон вместо цикла по coherence_score.
+
+    signals: матрица (n, L) — n окон длины L,
+    или 1D сигнал + window/hop — окна нарезаются через sliding_window_view (без копий);
+    hop по умолчанию 1, hop < 1 — ValueError.
+    Возвращает массив (n,) в процентах; короткие (< 8) и плоские окна дают 0.0,
+    как и в скалярной функции.
+    """
+    x = np.asarray(signals, dtype=float)
+    if x.ndim == 1:
+        if window is None:
+            x = x[None, :]
+        else:
+            hop = 1 if hop is None else int(hop)
+            if hop < 1:
+                raise ValueError(f"coherence_scores: hop должен быть ≥ 1, получено {hop}")
+            if len(x) < window:
+                return np.zeros(0)
+            x = sliding_window_view(x, window)[::hop]
+    n, length = x.shape
+    if length < 8 or n == 0:
+        return np.zeros(n)
+
+    x = x - x.mean(axis=1, keepdims=True)
+    spec = np.abs(rfft(x, axis=1))**2
+    plan = get_plan(length, fps=fps, target_hz=target_hz, band=band)
+    band_energy = spec[:, plan.band_index].sum(axis=1)
+    total = spec.sum(axis=1) + 1e-9
+    scores = 100.0 * band_energy / total
+    scores[np.isclose(x.std(axis=1), 0, rtol=0)] = 0.0
+    return scores
+
+
+
+class StreamingCoherence:
+    """
+    Потоковая когерентность по скользящему окну длины window без повторного FFT.
+
+    Скользящее ДПФ (sliding DFT) обновляет только бины полосы target_hz ± band
+    (и бин Найквиста для общей энергии) — O(число бинов полосы) на сэмпл.
+    Общая энергия спектра rfft центрированного окна выражается через скользящие
+    суммы x и x² (теорема Парсеваля), поэтому score доступен на каждом шаге «бесплатно».
+    Раз в resync_every сэмплов состояние пересчитывается точно из кольцевого буфера,
+    чтобы ограничить накопление ошибки округления.
+    """
+    def __init__(self, window=32, fps=1.0, target_hz=0.1, band=0.03, resync_every=1024):
+        self.window = int(window)
+        self.fps = fps
+        self.target_hz = target_hz
+        self.band = band
+        self.resync_every = max(1, int(resync_every))
+
+        L = self.window
+        band_mask = get_plan(L, fps=fps, target_hz=target_hz, band=band).band_mask.copy()
+        # DC-бин центрированного окна всегда 0 — его не отслеживаем
+        band_mask[0] = False
+        self._nyquist = L // 2 if L % 2 == 0 else None
+        tracked = np.flatnonzero(band_mask)
+        if self._nyquist is not None and not band_mask[self._nyquist]:
+            tracked = np.append(tracked, self._nyquist)
+        self._bins = tracked
+        self._in_band = band_mask[tracked]
+        self._twiddle = np.exp(2j * np.pi * tracked / L)
+        # базис для точного пересчёта бинов: X_k = Σ x_n e^{-j2πkn/L}
+        self._basis = np.exp(-2j * np.pi * np.outer(tracked, np.arange(L)) / L)
+
+        self.reset()
+
+    def reset(self):
+        self._buf = np.zeros(self.window, dtype=float)
+        self._pos = 0          # куда запишется следующий сэмпл (самый старый в окне)
+        self.count = 0         # сколько сэмплов пришло всего
+        self._X = np.zeros(len(self._bins), dtype=complex)
+        self._s1 = 0.0
+        self._s2 = 0.0
+        self._since_resync = 0
+        self._score = 0.0
+
+    @property
+    def ready(self):
+        """Окно заполнено — score совпадает с coherence_score(последние window сэмплов)."""
+        return self.count >= self.window
+
+    @property
+    def score(self):
+        return self._score
+
+    def _ordered(self):
+        """Содержимое окна в хронологическом порядке."""
+        return np.concatenate([self._buf[self._pos:], self._buf[:self._pos]])
+
+    def resync(self):
+        """Точный пересчёт бинов и скользящих сумм из буфера (сброс дрейфа)."""
+        x = self._ordered()
+        self._X = self._basis @ x
+        self._s1 = float(x.sum())
+        self._s2 = float(x @ x)
+        self._since_resync = 0
+
+    def update(self, x):
+        """Добавляет один сэмпл и возвращает текущую когерентность (в процентах)."""
+        x = float(x)
+        old = self._buf[self._pos]
+        self._buf[self._pos] = x
+        self._pos = (self._pos + 1) % self.window
+        self.count += 1
+
+        # X_k ← (X_k + x_new − x_old) · e^{j2πk/L}
+        self._X += x - old
+        self._X *= self._twiddle
+        self._s1 += x - old
+        self._s2 += x * x - old * old
+
+        self._since_resync += 1
+        if self._since_resync >= self.resync_every:
+            self.resync()
+
+        self._score = self._compute()
+        return self._score
+
+    def extend(self, values):
+        """Добавляет блок сэмплов; возвращает массив когерентностей после каждого из них."""
+        values = np.asarray(values, dtype=float).ravel()
+        out = np.empty(len(values))
+        for i, v in enumerate(values):
+            out[i] = self.update(v)
+        return out
+
+    def _compute(self):
+        if not self.ready:
+            # прогрев: окно ещё не заполнено — считаем точно по имеющимся сэмплам
+            if self.count < 8:
+                return 0.0
+            return coherence_score(self._buf[:self.count], fps=self.fps,
+                                   target_hz=self.target_hz, band=self.band)
+
+        L = self.window
+        centered_sq = self._s2 - self._s1 * self._s1 / L   # Σ (x − mean)²
+        if centered_sq <= 0 or np.sqrt(centered_sq / L) <= 1e-8:
+            return 0.0   # как np.allclose(x.std(), 0) в coherence_score
+
+        power = self._X.real ** 2 + self._X.imag ** 2
+        band_energy = power[self._in_band].sum()
+        # Σ|rfft|² = (L·Σx_c² + |X_{L/2}|²) / 2 при X_0 = 0
+        total = L * centered_sq
+        if self._nyquist is not None:
+            total += power[self._bins == self._nyquist].sum()
+        total = total / 2.0 + 1e-9
+        return float(100.0 * band_energy / total)
@@ -1,7 +1,14 @@
 # planet_pattern/rhythm.py
+import bisect
+
 import numpy as np
 
 
+# Коды фаз для массивного API (порядок совпадает с pattern)
+PHASE_NAMES = ('inhale', 'hold1', 'exhale', 'hold2')
+PHASE_CODES = {name: code for code, name in enumerate(PHASE_NAMES)}
+
+
 class BreathClock:
     """
     Дискретный «пульс»: вдох→пауза→выдох→тишина.
@@ -11,9 +18,31 @@ class BreathClock:
         self.pattern = [('inhale', inhale), ('hold1', hold1),
                         ('exhale', exhale), ('hold2', hold2)]
         self.period = sum(d for _, d in self.pattern)
+        self._build_lut()
+
+    def _build_lut(self):
+        """
+        Таблица на один период: код фазы и локальный прогресс для каждого t_mod.
+        Значения считаются той же формулой, что и в цикле phase_at — результаты совпадают бит-в-бит.
+        """
+        codes = np.empty(self.period, dtype=np.int8)
+        progress = np.empty(self.period, dtype=float)
+        acc = 0
+        for name, dur in self.pattern:
+            for i in range(dur):
+                codes[acc + i] = PHASE_CODES[name]
+                progress[acc + i] = i / max(1, dur)
+            acc += dur
+        codes.flags.writeable = False
+        progress.flags.writeable = False
+        self.lut_codes = codes
+        self.lut_progress = progress
 
     def phase_at(self, t):
         """Возвращает фазу и локальный прогресс в рамках периода."""
+        if isinstance(t, (int, np.integer)) and self.period > 0:
+            t_mod = int(t) % self.period
+            return PHASE_NAMES[self.lut_codes[t_mod]], float(self.lut_progress[t_mod])
         t_mod = t % self.period
         acc = 0
         for name, dur in self.pattern:
@@ -23,6 +52,18 @@ class BreathClock:
             acc += dur
         return 'hold2', 1.0
 
+    def phases_at(self, t):
+        """
+        Векторная версия phase_at для целочисленного массива индексов.
+        Возвращает (codes, progress): коды фаз (int8, см. PHASE_NAMES) и прогресс [0..1].
+        """
+        t_mod = np.asarray(t, dtype=np.int64) % self.period
+        return self.lut_codes[t_mod], self.lut_progress[t_mod]
+
+    def phase_block(self, start, length):
+        """Фазы для непрерывного блока индексов [start, start + length)."""
+        return self.phases_at(np.arange(start, start + length, dtype=np.int64))
+
     def target_wave(self, length, breaths_per_min=6.0, fps=1.0):
         """
         Синтетическая целевая волна 0.1 Гц (для расчёта резонанса).
@@ -32,3 +73,48 @@ class BreathClock:
         t = np.arange(length) / fps
         return np.sin(2 * np.pi * f * t)
 
+
+class BreathSchedule:
+    """
+    Расписание дыхательных паттернов на длинной шкале времени.
+    segments: список (start_t, BreathClock) — с момента start_t действует этот ритм,
+    и его период отсчитывается заново от start_t. Поиск сегмента — O(log n).
+    """
+    def __init__(self, segments):
+        segments = sorted(segments, key=lambda s: s[0])
+        if not segments:
+            raise ValueError("BreathSchedule: нужен хотя бы один сегмент")
+        self.starts = [int(s) for s, _ in segments]
+        self.clocks = [clock for _, clock in segments]
+        if any(clock.period <= 0 for clock in self.clocks):
+            raise ValueError("BreathSchedule: период каждого ритма должен быть > 0")
+
+        # Склеенные таблицы всех сегментов + смещения — для полностью векторного поиска
+        self._starts_arr = np.asarray(self.starts, dtype=np.int64)
+        self._periods = np.asarray([c.period for c in self.clocks], dtype=np.int64)
+        self._offsets = np.concatenate([[0], np.cumsum(self._periods)[:-1]]).astype(np.int64)
+        self._codes = np.concatenate([c.lut_codes for c in self.clocks])
+        self._progress = np.concatenate([c.lut_progress for c in self.clocks])
+
+    def segment_at(self, t):
+        """Индекс сегмента, действующего в момент t (до первого start — первый сегмент)."""
+        return max(0, bisect.bisect_right(self.starts, t) - 1)
+
+    def clock_at(self, t):
+        return self.clocks[self.segment_at(t)]
+
+    def phase_at(self, t):
+        seg = self.segment_at(t)
+        return self.clocks[seg].phase_at(t - self.starts[seg])
+
+    def phases_at(self, t):
+        """Векторный поиск фаз: (codes, progress) для массива индексов."""
+        t = np.asarray(t, dtype=np.int64)
+        seg = np.searchsorted(self._starts_arr, t, side='right') - 1
+        np.maximum(seg, 0, out=seg)
+        local = (t - self._starts_arr[seg]) % self._periods[seg]
+        idx = self._offsets[seg] + local
+        return self._codes[idx], self._progress[idx]
+
+    def phase_block(self, start, length):
+        return self.phases_at(np.arange(start, start + length, dtype=np.int64))
@@ -0,0 +1,271 @@
+# planet_pattern/simulation.py
+"""
+Единый движок симуляции для run_demo.py, run_demo_v2.py и dashboard.py.
+
+Цикл тот же, что и в драйверах:
+    BreathClock → act → когерентность каждые 8 → learn → память каждые 16 → сон каждые N.
+Но шаги между событиями считаются блоками: alpha агентов меняется только в событиях
+(learn, сон), поэтому сигналы всех агентов на отрезке до ближайшего события —
+одна векторная операция над таблицей фаз и блоком шума из потоков агентов.
+Результаты совпадают бит-в-бит с поэлементным циклом на тех же потоках шума.
+"""
+import weakref
+
+import numpy as np
+
+from instrumentation import metrics
+from noise_stream import spawn_seeds
+from physics import ENERGY_DTYPE, energy_kernel
+from resonance import coherence_score
+from rhythm import BreathClock
+from sleep_cycle import StreamingConsolidator, consolidate
+from spectral_plan import plan_cache
+from wave_memory import WaveletMemory
+
+
+class SimulationConfig:
+    """Параметры прогона (значения по умолчанию — как в run_demo_v2.py)."""
+    def __init__(self, n_cycles=200, fps=1.0, sleep_every=40, window=32,
+                 coherence_every=8, memory_every=16, target_hz=0.1, band=0.03,
+                 learn_target=50.0, breaths_per_min=6.0, noise_scale=0.2,
+                 sleep_alpha_bounds=(0.1, 1.0), compute_energy=True, centroids_k=8,
+                 memory_max_windows=512, memory_clusters=8, consolidation='centroids',
+                 consolidation_decay=None, seed=None):
+        self.n_cycles = n_cycles
+        self.fps = fps
+        self.sleep_every = sleep_every
+        self.window = window
+        self.coherence_every = coherence_every
+        self.memory_every = memory_every
+        self.target_hz = target_hz
+        self.band = band
+        self.learn_target = learn_target
+        self.breaths_per_min = breaths_per_min
+        self.noise_scale = noise_scale
+        self.sleep_alpha_bounds = sleep_alpha_bounds
+        self.compute_energy = compute_energy
+        self.centroids_k = centroids_k
+        self.memory_max_windows = memory_max_windows
+        self.memory_clusters = memory_clusters
+        self.consolidation = consolidation
+        self.consolidation_decay = consolidation_decay
+        self.seed = seed
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def _memory_total(ref, measure):
+    """Сумма measure(memory) по памятям симуляции; NaN, если симуляция уже собрана."""
+    sim = ref()
+    if sim is None:
+        return float('nan')
+    return sum(measure(m) for m in sim.memories)
+
+
+class Simulation:
+    """
+    agents — список PlanetAgent / FixedAgent (состояние alpha и поток шума живут в них самих).
+    config.seed, если задан, пересевает потоки агентов дочерними seed — прогон
+    воспроизводим в любом процессе.
+    Хуки: add_hook('coherence' | 'memory' | 'sleep' | 'chunk', fn), fn(sim, t, payload).
+    Стадии (act, coherence, energy, memory.push, sleep, sleep.consolidate, hook.*)
+    замеряются глобальным instrumentation.metrics, если он включён.
+
+    Консолидация во сне (config.consolidation):
+        'centroids' — consolidate по k ядрам памяти (как в run_demo_v2.py, по умолчанию);
+        'streaming' — каждое окно памяти сразу уходит в StreamingConsolidator
+                      (config.consolidation_decay — забывание), сон читает его ядро за O(d):
+                      между снами ничего не копится, инкрементальный k-means не нужен.
+
+    Результаты (массивы на весь прогон, строки — шаги или события):
+        signals (n_cycles, n_agents), alpha (n_cycles, n_agents) — alpha в момент act,
+        coherence_t, coherence (m, n_agents), energy (m, n_agents) ENERGY_DTYPE,
+        sleep_t — шаги t+1, на которых был сон.
+    """
+    EVENTS = ('coherence', 'memory', 'sleep', 'chunk')
+
+    def __init__(self, config, agents, clock=None, memories=None):
+        self.config = config
+        self.agents = list(agents)
+        self.clock = clock or BreathClock()
+        cfg = config
+        if cfg.seed is not None:
+            for agent, seed in zip(self.agents, spawn_seeds(cfg.seed, len(self.agents))):
+                agent.reseed(seed)
+        if cfg.consolidation not in ('centroids', 'streaming'):
+            raise ValueError(f"Simulation: неизвестный режим консолидации {cfg.consolidation!r}")
+        self.memories = memories or [
+            WaveletMemory(window_size=cfg.window, wavelet='db2', max_windows=cfg.memory_max_windows,
+                          storage='ring',
+                          n_clusters=cfg.memory_clusters if cfg.consolidation == 'centroids' else None)
+            for _ in self.agents
+        ]
+        if cfg.consolidation == 'streaming':
+            # каждое записанное окно сразу попадает в консолидатор памяти агента
+            for memory in self.memories:
+                if memory.consolidator is None:
+                    memory.consolidator = StreamingConsolidator(dim=memory.coeff_len,
+                                                                decay=cfg.consolidation_decay)
+        self.target_wave = self.clock.target_wave(cfg.n_cycles, breaths_per_min=cfg.breaths_per_min, fps=cfg.fps)
+        # идеальный ритм на период — теми же скалярными вызовами, что и в PlanetAgent.act
+        self._ideal_lut = np.array([np.sin(2*np.pi*float(p)) for p in self.clock.lut_progress])
+        self.hooks = {event: [] for event in self.EVENTS}
+
+        n, k = cfg.n_cycles, len(self.agents)
+        self.signals = np.zeros((n, k))
+        self.alpha = np.zeros((n, k))
+        n_checks = len(self._event_steps(cfg.coherence_every))
+        self.coherence_t = np.zeros(n_checks, dtype=np.int64)
+        self.coherence = np.zeros((n_checks, k))
+        self.energy = np.zeros((n_checks if cfg.compute_energy else 0, k), dtype=ENERGY_DTYPE)
+        self.sleep_t = []
+        self.n_checks = 0
+        self.t = 0
+
+    def add_hook(self, event, fn):
+        if event not in self.hooks:
+            raise ValueError(f"Simulation: неизвестное событие {event!r}, ожидается одно из {self.EVENTS}")
+        self.hooks[event].append(fn)
+        return fn
+
+    def _fire(self, event, t, payload=None):
+        if not self.hooks[event]:
+            return
+        with metrics.span('hook.' + event):
+            for fn in self.hooks[event]:
+                fn(self, t, payload)
+
+    def _register_gauges(self):
+        # реестр глобальный: слабая ссылка, чтобы gauge не держал отработавшую симуляцию
+        ref = weakref.ref(self)
+        metrics.gauge('memory.windows', lambda: _memory_total(ref, len))
+        metrics.gauge('memory.nbytes', lambda: _memory_total(ref, lambda m: m.nbytes))
+        metrics.gauge('spectral_plan.hit_rate', lambda: plan_cache.info()['hit_rate'])
+        metrics.gauge('spectral_plan.size', lambda: plan_cache.info()['size'])
+
+    def _event_steps(self, every):
+        """Шаги, на которых окно уже заполнено и t кратно every."""
+        first = self.config.window - 1
+        start = first + (-first) % every
+        return range(start, self.config.n_cycles, every)
+
+    def _is_event(self, t):
+        cfg = self.config
+        full = t >= cfg.window - 1
+        return (full and (t % cfg.coherence_every == 0 or t % cfg.memory_every == 0)) \
+            or (t + 1) % cfg.sleep_every == 0
+
+    def _next_event(self, t, stop):
+        """Первый шаг ≥ t (но < stop), после которого что-то меняется."""
+        cfg = self.config
+        candidates = [stop - 1]
+        first = max(t, cfg.window - 1)
+        for every in (cfg.coherence_every, cfg.memory_every):
+            candidates.append(first + (-first) % every)
+        candidates.append(t + (-(t + 1)) % cfg.sleep_every)
+        return min(c for c in candidates if c >= t)
+
+    @property
+    def done(self):
+        return self.t >= self.config.n_cycles
+
+    def run(self):
+        """Прогон до конца."""
+        return self.advance(self.config.n_cycles - self.t)
+
+    def advance_periods(self, n_periods=1):
+        """Продвигает симуляцию на целое число дыхательных периодов."""
+        return self.advance(n_periods * self.clock.period)
+
+    def advance(self, n_steps):
+        stop = min(self.config.n_cycles, self.t + n_steps)
+        if metrics.enabled:
+            self._register_gauges()
+            metrics.count('steps', max(0, stop - self.t))
+        while self.t < stop:
+            t_end = self._next_event(self.t, stop)
+            with metrics.span('act'):
+                self._act_block(self.t, t_end + 1)
+            if self._is_event(t_end):
+                self._events(t_end)
+            self.t = t_end + 1
+        self._fire('chunk', self.t)
+        return self
+
+    def _act_block(self, t0, t1):
+        """Сигналы всех агентов на шагах [t0, t1) — alpha на отрезке постоянна."""
+        m = t1 - t0
+        alpha = np.array([agent.alpha for agent in self.agents], dtype=float)
+        ideal = self._ideal_lut[np.arange(t0, t1) % self.clock.period][:, None]
+        noise = np.empty((m, len(self.agents)))
+        for j, agent in enumerate(self.agents):
+            noise[:, j] = agent.noise.normal(0, self.config.noise_scale, size=m)
+        self.signals[t0:t1] = alpha * ideal + (1 - alpha) * noise
+        self.alpha[t0:t1] = alpha
+
+    def _events(self, t):
+        cfg = self.config
+        w0 = t - cfg.window + 1
+        if t >= cfg.window - 1 and t % cfg.coherence_every == 0:
+            i = self.n_checks
+            self.coherence_t[i] = t
+            with metrics.span('coherence'):
+                for j, agent in enumerate(self.agents):
+                    score = coherence_score(self.signals[w0:t + 1, j], fps=cfg.fps,
+                                            target_hz=cfg.target_hz, band=cfg.band)
+                    self.coherence[i, j] = score
+                    agent.learn(score, target=cfg.learn_target)
+            energies = None
+            if cfg.compute_energy:
+                with metrics.span('energy'):
+                    # окна агентов — строками подряд: тот же порядок суммирования, что у одиночного окна
+                    energies = energy_kernel(np.ascontiguousarray(self.signals[w0:t + 1].T),
+                                             reference_wave=self.target_wave[max(0, t - cfg.window + 1):t + 1],
+                                             fps=cfg.fps)
+                self.energy[i] = energies
+            self.n_checks += 1
+            metrics.count('coherence.checks')
+            self._fire('coherence', t, {"scores": self.coherence[i], "energy": energies})
+
+        if t >= cfg.window - 1 and t % cfg.memory_every == 0:
+            phase = self.clock.phase_at(t)[0]
+            with metrics.span('memory.push'):
+                for j, (agent, memory) in enumerate(zip(self.agents, self.memories)):
+                    memory.push_series(self.signals[w0:t + 1, j], meta={'t': t, 'phase': phase, 'agent': agent.name})
+            metrics.count('memory.windows_pushed', len(self.agents))
+            self._fire('memory', t)
+
+        if (t + 1) % cfg.sleep_every == 0:
+            lo, hi = cfg.sleep_alpha_bounds
+            cores = []
+            with metrics.span('sleep'):
+                for agent, memory in zip(self.agents, self.memories):
+                    core = None
+                    if agent.adaptive:
+                        with metrics.span('sleep.consolidate'):
+                            if cfg.consolidation == 'streaming':
+                                core = memory.consolidator.core()
+                            else:
+                                core = consolidate(memory.retrieve_centroids(k=cfg.centroids_k))
+                    if core is not None:
+                        drift = float(np.mean(np.abs(core)))
+                        agent.alpha = float(np.clip(agent.alpha * (1.0 + 0.05*drift), lo, hi))
+                    cores.append(core)
+            self.sleep_t.append(t + 1)
+            metrics.count('sleep.cycles')
+            self._fire('sleep', t, cores)
+
+    def results(self):
+        """Срез результатов на текущий момент (массивы обрезаны до пройденных шагов)."""
+        n = self.n_checks
+        return {
+            "t": self.t,
+            "signals": self.signals[:self.t],
+            "alpha": self.alpha[:self.t],
+            "coherence_t": self.coherence_t[:n],
+            "coherence": self.coherence[:n],
+            "energy": self.energy[:n] if self.config.compute_energy else None,
+            "sleep_t": list(self.sleep_t),
+            "final_alpha": [agent.alpha for agent in self.agents],
+        }
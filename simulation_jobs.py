@@ -0,0 +1,202 @@
+# planet_pattern/simulation_jobs.py
+"""
+Фоновые прогоны Simulation для дашборда.
+
+SimulationJob считает симуляцию в отдельном потоке кусками по chunk_steps шагов
+и после каждого куска публикует, сколько шагов / проверок / снов готово.
+Массивы результатов Simulation предвыделены и каждая строка пишется один раз,
+поэтому snapshot() отдаёт срезы-представления до опубликованных счётчиков —
+без копий и без остановки счёта.
+
+JobRegistry — общий на процесс реестр (в дашборде — через st.cache_resource):
+прогоны с одинаковым ключом (параметры + seed) считаются один раз и видны всем
+сессиям. Одновременно считается не больше max_running прогонов, остальные ждут
+в очереди; завершённые вытесняются по LRU, а заброшенные (никто не опрашивает
+idle_ttl секунд) — по сроку, идущие — с отменой.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class SimulationJob:
+    """
+    start=False — прогон создаётся в очереди (status 'pending') и запускается
+    позже вызовом start() (так JobRegistry ограничивает число идущих прогонов).
+    on_finish(job) вызывается из потока прогона после его завершения.
+    """
+    def __init__(self, key, build, chunk_steps=2048, start=True, on_finish=None):
+        self.key = key
+        self.chunk_steps = chunk_steps
+        self.status = 'pending'        # 'pending' | 'running' | 'done' | 'error' | 'cancelled'
+        self.error = None
+        self.sim = None
+        self.started = None
+        self.finished = None
+        self.on_finish = on_finish
+        self._published = (0, 0, 0)    # (шагов, проверок, снов)
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(build,), daemon=True,
+                                        name=f"simulation-job-{key}")
+        if start:
+            self.start()
+
+    def start(self):
+        if self.status != 'pending':
+            return self
+        self.status = 'running'
+        self.started = time.time()
+        self._thread.start()
+        return self
+
+    def _run(self, build):
+        try:
+            sim = build()
+            self.sim = sim
+            while not sim.done and not self._cancel.is_set():
+                sim.advance(self.chunk_steps)
+                self._published = (sim.t, sim.n_checks, len(sim.sleep_t))
+            self.status = 'cancelled' if self._cancel.is_set() else 'done'
+        except Exception as exc:       # ошибку показывает дашборд, поток не падает молча
+            self.error = exc
+            self.status = 'error'
+        finally:
+            self._finish()
+
+    def _finish(self):
+        self.finished = time.time()
+        self._finished.set()
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+    @property
+    def done(self):
+        return self.status not in ('pending', 'running')
+
+    @property
+    def progress(self):
+        if self.sim is None:
+            return 0.0
+        return self._published[0] / self.sim.config.n_cycles
+
+    def cancel(self):
+        self._cancel.set()
+        if self.status == 'pending':   # поток ещё не запущен — завершаем сразу
+            self.status = 'cancelled'
+            self._finish()
+
+    def wait(self, timeout=None):
+        self._finished.wait(timeout)
+        return self.done
+
+    def snapshot(self):
+        """Готовая часть результатов: представления массивов Simulation до опубликованных счётчиков."""
+        sim = self.sim
+        t, n, n_sleep = self._published
+        if sim is None:
+            return None
+        return {
+            "t": t,
+            "n_cycles": sim.config.n_cycles,
+            "signals": sim.signals[:t],
+            "alpha": sim.alpha[:t],
+            "coherence_t": sim.coherence_t[:n],
+            "coherence": sim.coherence[:n],
+            "energy": sim.energy[:n] if sim.config.compute_energy else None,
+            "sleep_t": sim.sleep_t[:n_sleep],
+            "final_alpha": [agent.alpha for agent in sim.agents] if self.status == 'done' else None,
+        }
+
+
+class JobRegistry:
+    """
+    max_running — сколько прогонов считается одновременно; остальные ждут в очереди
+    (status 'pending', FIFO) и запускаются, как только освобождается место.
+    Идущий прогон никогда не отменяется ради другого: его либо дождутся, либо он
+    вытесняется по idle_ttl — когда его никто не запрашивал (в дашборде — не опрашивал)
+    idle_ttl секунд; None — без срока.
+    max_jobs — сколько завершённых прогонов держать (LRU по последнему запросу);
+    max_pending — длина очереди: сверх неё get_or_start бросает RuntimeError.
+    Отменённый или упавший прогон возвращается как есть; заново он считается
+    только по явному get_or_start(..., restart=True).
+    """
+    def __init__(self, max_jobs=32, chunk_steps=2048, max_running=4, max_pending=64, idle_ttl=600.0):
+        self.max_jobs = max_jobs
+        self.chunk_steps = chunk_steps
+        self.max_running = max_running
+        self.max_pending = max_pending
+        self.idle_ttl = idle_ttl
+        self._jobs = OrderedDict()     # ключ → прогон, от давно запрошенных к недавним
+        self._queue = []               # ключи ожидающих прогонов в порядке постановки
+        self._seen = {}                # ключ → время последнего запроса
+        self._lock = threading.Lock()
+
+    def get_or_start(self, key, build, restart=False):
+        """
+        Прогон с ключом key: уже известный (идущий, в очереди, готовый, отменённый, упавший)
+        либо новый (build() → Simulation). restart=True — пересчитать отменённый или упавший.
+        """
+        with self._lock:
+            now = time.time()
+            self._expire(now, keep=key)
+            job = self._jobs.get(key)
+            if job is None or (restart and job.status in ('cancelled', 'error')):
+                if len(self._queue) >= self.max_pending and key not in self._queue:
+                    raise RuntimeError(f"JobRegistry: очередь прогонов заполнена ({self.max_pending})")
+                job = SimulationJob(key, build, chunk_steps=self.chunk_steps, start=False,
+                                    on_finish=self._on_finish)
+                self._jobs[key] = job
+                self._queue.append(key)
+            self._jobs.move_to_end(key)
+            self._seen[key] = now
+            self._schedule()
+            self._evict_finished(keep=key)
+            return job
+
+    def _on_finish(self, job):
+        with self._lock:
+            self._schedule()
+
+    def _schedule(self):
+        """Запускает ожидающие прогоны, пока есть свободные места."""
+        running = sum(job.status == 'running' for job in self._jobs.values())
+        while self._queue and running < self.max_running:
+            key = self._queue.pop(0)
+            job = self._jobs.get(key)
+            if job is not None and job.status == 'pending':
+                job.start()
+                running += 1
+
+    def _drop(self, key):
+        job = self._jobs.pop(key)
+        self._seen.pop(key, None)
+        if key in self._queue:
+            self._queue.remove(key)
+        job.on_finish = None           # место освобождается здесь же, без повторного входа в lock
+        job.cancel()
+
+    def _expire(self, now, keep=None):
+        if self.idle_ttl is None:
+            return
+        for key in [k for k in self._jobs if k != keep and now - self._seen[k] > self.idle_ttl]:
+            self._drop(key)
+
+    def _evict_finished(self, keep=None):
+        finished = [key for key, job in self._jobs.items() if job.done and key != keep]
+        while sum(job.done for job in self._jobs.values()) > self.max_jobs and finished:
+            self._drop(finished.pop(0))
+        self._schedule()
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def info(self):
+        with self._lock:
+            return {
+                "jobs": len(self._jobs),
+                "running": sum(job.status == 'running' for job in self._jobs.values()),
+                "pending": len(self._queue),
+                "max_jobs": self.max_jobs,
+                "max_running": self.max_running,
+            }
@@ -15,3 +15,245 @@ def consolidate(centroids):
     norm = np.linalg.norm(core) + 1e-9
     return core / norm
 
+
+
+class StreamingConsolidator:
+    """
+    Потоковая консолидация: бегущее среднее и дисперсия коэффициентов (Уэлфорд)
+    по всем окнам по мере их поступления, а не только по k ядрам на момент сна.
+    Сон становится чтением за O(d) — не зависит от объёма истории.
+
+    decay — необязательное экспоненциальное забывание: перед каждым новым окном
+    вес накопленной истории умножается на (1 - decay).
+    Состояния двух консолидаторов (шарды, узлы) объединяются через merge —
+    без забывания результат совпадает с обработкой всех окон одним консолидатором.
+    """
+    def __init__(self, dim=None, decay=None):
+        self.dim = dim
+        self.decay = decay
+        self.count = 0          # сколько окон пришло
+        self.weight = 0.0       # суммарный (с учётом забывания) вес
+        self.mean = None if dim is None else np.zeros(dim)
+        self.m2 = None if dim is None else np.zeros(dim)   # Σ w·(x − mean)²
+
+    def _ensure(self, dim):
+        if self.mean is None:
+            self.dim = dim
+            self.mean = np.zeros(dim)
+            self.m2 = np.zeros(dim)
+        elif dim != self.dim:
+            raise ValueError(f"StreamingConsolidator: размерность {dim}, ожидалась {self.dim}")
+
+    def update(self, windows):
+        """Добавляет окно (d,) или пакет окон (n, d); пакет эквивалентен поочерёдной подаче."""
+        X = np.atleast_2d(np.asarray(windows, dtype=float))
+        n = len(X)
+        if n == 0:
+            return self
+        self._ensure(X.shape[1])
+        if self.decay:
+            keep = 1.0 - self.decay
+            # вес i-го окна пакета к моменту прихода последнего: keep^(n-1-i)
+            w = keep ** np.arange(n - 1, -1, -1, dtype=float)
+            self.weight *= keep ** n
+            self.m2 *= keep ** n
+        else:
+            w = np.ones(n)
+        wb = w.sum()
+        mean_b = w @ X / wb
+        m2_b = w @ (X - mean_b) ** 2
+        self._combine(wb, mean_b, m2_b)
+        self.count += n
+        return self
+
+    def _combine(self, wb, mean_b, m2_b):
+        """Объединение весовых статистик (формула Чана)."""
+        wa = self.weight
+        total = wa + wb
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (wb / total)
+        self.m2 = self.m2 + m2_b + delta ** 2 * (wa * wb / total)
+        self.weight = total
+
+    def merge(self, other):
+        """Вливает состояние другого консолидатора (например, другого шарда)."""
+        if other.mean is None or other.weight == 0:
+            return self
+        self._ensure(other.dim)
+        self._combine(other.weight, other.mean, other.m2)
+        self.count += other.count
+        return self
+
+    @property
+    def variance(self):
+        if self.mean is None or self.weight == 0:
+            return None
+        return self.m2 / self.weight
+
+    def core(self):
+        """«Ядро опыта» — нормированное среднее, как у consolidate, но за O(d)."""
+        if self.mean is None or self.weight == 0:
+            return None
+        norm = np.linalg.norm(self.mean) + 1e-9
+        return self.mean / norm
+
+    def state(self):
+        """Сериализуемое состояние (для передачи между узлами)."""
+        return {
+            "dim": self.dim,
+            "decay": self.decay,
+            "count": self.count,
+            "weight": self.weight,
+            "mean": None if self.mean is None else self.mean.tolist(),
+            "m2": None if self.m2 is None else self.m2.tolist(),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls(dim=state["dim"], decay=state["decay"])
+        obj.count = state["count"]
+        obj.weight = state["weight"]
+        if state["mean"] is not None:
+            obj.mean = np.asarray(state["mean"], dtype=float)
+            obj.m2 = np.asarray(state["m2"], dtype=float)
+        return obj
+
+
+class LowRankConsolidator:
+    """
+    Консолидация в базис ранга r: вместо одного среднего вектора храним среднее
+    и r главных направлений памяти (Σ, V) — компактную долговременную память,
+    которую дёшево хранить, сравнивать и передавать.
+
+    Базис обновляется инкрементально (SVD Бранда со сдвигом среднего):
+    новые окна дописываются к Σ·Vᵀ и раскладывается только матрица (r + n + 1) × d —
+    без повторной факторизации всей истории. Для большого начального объёма есть fit
+    (рандомизированный SVD). decay — экспоненциальное забывание, как у StreamingConsolidator.
+    Подходит в качестве consolidator для WaveletMemory (метод update).
+    """
+    def __init__(self, rank=8, dim=None, decay=None):
+        self.rank = rank
+        self.decay = decay
+        self.stats = StreamingConsolidator(dim=dim, decay=decay)
+        self.singular_values = np.zeros(0)
+        self.basis = None            # V: (d, r') — строки памяти ≈ mean + Z · Vᵀ
+
+    @property
+    def dim(self):
+        return self.stats.dim
+
+    @property
+    def mean(self):
+        return self.stats.mean
+
+    def _fold(self, rows):
+        """SVD сложенных строк → новые (Σ, V) ранга не выше rank."""
+        _, s, vt = np.linalg.svd(rows, full_matrices=False)
+        r = min(self.rank, len(s))
+        self.singular_values = s[:r]
+        self.basis = vt[:r].T
+
+    def update(self, windows):
+        """Добавляет окно (d,) или пакет (n, d) в базис."""
+        X = np.atleast_2d(np.asarray(windows, dtype=float))
+        if len(X) == 0:
+            return self
+        mean_old = None if self.stats.mean is None else self.stats.mean.copy()
+        weight_old = self.stats.weight
+        if self.decay:
+            keep = (1.0 - self.decay) ** len(X)
+            weight_old *= keep
+            self.singular_values = self.singular_values * np.sqrt(keep)
+        self.stats.update(X)
+
+        # веса окон пакета — те же, что у StreamingConsolidator: keep^(n-1-i) при забывании
+        if self.decay:
+            w = (1.0 - self.decay) ** np.arange(len(X) - 1, -1, -1, dtype=float)
+        else:
+            w = np.ones(len(X))
+        w_b = w.sum()
+        mean_b = w @ X / w_b
+        parts = []
+        if self.basis is not None:
+            parts.append(self.singular_values[:, None] * self.basis.T)
+        parts.append(np.sqrt(w)[:, None] * (X - mean_b))
+        if mean_old is not None and weight_old > 0:
+            # поправка на сдвиг среднего (Ross et al., 2008) — с затухшим весом истории
+            # и суммарным весом пакета
+            parts.append(np.sqrt(weight_old * w_b / (weight_old + w_b)) * (mean_b - mean_old)[None, :])
+        self._fold(np.vstack(parts))
+        return self
+
+    def fit(self, X, oversample=10, n_iter=2, seed=0):
+        """Начальный базис по большой матрице X (n, d) рандомизированным SVD (Halko et al.)."""
+        X = np.asarray(X, dtype=float)
+        self.stats = StreamingConsolidator(dim=X.shape[1], decay=self.decay).update(X)
+        Xc = X - X.mean(axis=0)
+        k = min(self.rank + oversample, *Xc.shape)
+        rng = np.random.default_rng(seed)
+        Y = Xc @ rng.standard_normal((Xc.shape[1], k))
+        for _ in range(n_iter):
+            Y = Xc @ (Xc.T @ Y)
+        Q, _ = np.linalg.qr(Y)
+        self._fold(Q.T @ Xc)
+        return self
+
+    def merge(self, other):
+        """Объединяет базисы двух консолидаторов (шарды/узлы) одним малым SVD."""
+        if other.basis is None:
+            return self
+        if self.basis is None:
+            self.stats = StreamingConsolidator.from_state(other.stats.state())
+            self.singular_values, self.basis = other.singular_values.copy(), other.basis.copy()
+            return self
+        wa, wb = self.stats.weight, other.stats.weight
+        shift = np.sqrt(wa * wb / (wa + wb)) * (other.mean - self.mean)
+        rows = np.vstack([self.singular_values[:, None] * self.basis.T,
+                          other.singular_values[:, None] * other.basis.T,
+                          shift[None, :]])
+        self.stats.merge(other.stats)
+        self._fold(rows)
+        return self
+
+    def _require_basis(self, what):
+        if self.basis is None:
+            raise ValueError(f"LowRankConsolidator.{what}: базис ещё не построен — сначала вызовите update или fit")
+
+    def project(self, windows):
+        """Окна (n, d) → r коэффициентов в базисе."""
+        self._require_basis('project')
+        X = np.atleast_2d(np.asarray(windows, dtype=float))
+        return (X - self.mean) @ self.basis
+
+    def reconstruct(self, coeffs):
+        """Коэффициенты (n, r) → окна (n, d)."""
+        self._require_basis('reconstruct')
+        return np.atleast_2d(coeffs) @ self.basis.T + self.mean
+
+    def reconstruction_error(self, windows):
+        """Относительная ошибка ‖X − X̂‖ / ‖X − mean‖ и ошибка по каждому окну."""
+        self._require_basis('reconstruction_error')
+        X = np.atleast_2d(np.asarray(windows, dtype=float))
+        resid = X - self.reconstruct(self.project(X))
+        per_window = np.linalg.norm(resid, axis=1)
+        centred = np.linalg.norm(X - self.mean) + 1e-12
+        return {
+            "relative": float(np.linalg.norm(resid) / centred),
+            "per_window": per_window,
+            "explained": self.explained_ratio(),
+        }
+
+    def explained_ratio(self):
+        """Доля (взвешенной) дисперсии памяти, которую объясняет базис."""
+        total = self.stats.m2.sum() if self.stats.m2 is not None else 0.0
+        return float((self.singular_values ** 2).sum() / total) if total > 0 else 0.0
+
+    def core(self):
+        """Нормированное среднее — совместимо с consolidate."""
+        return self.stats.core()
+
+    @property
+    def nbytes(self):
+        if self.basis is None:
+            return 0
+        return self.basis.nbytes + self.singular_values.nbytes + self.mean.nbytes
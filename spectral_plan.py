@@ -0,0 +1,93 @@
+# planet_pattern/spectral_plan.py
+"""
+Кэш «спектральных планов»: сетки частот, маски полосы и эталонные волны.
+
+Большинство окон в сервисе имеют одну из немногих длин, поэтому rfftfreq,
+маску полосы target_hz ± band и target_wave достаточно построить один раз
+на ключ (length, fps, target_hz, band, breaths_per_min). Все массивы плана
+только для чтения — их можно безопасно раздавать всем вызывающим.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy.fft import rfftfreq
+
+from rhythm import BreathClock
+
+
+def _readonly(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+class SpectralPlan:
+    """Неизменяемый набор предвычисленных массивов для окон одной длины."""
+    def __init__(self, length, fps=1.0, target_hz=0.1, band=0.03, breaths_per_min=6.0):
+        self.length = length
+        self.fps = fps
+        self.target_hz = target_hz
+        self.band = band
+        self.breaths_per_min = breaths_per_min
+
+        self.freqs = _readonly(rfftfreq(length, d=1.0/fps))
+        self.band_mask = _readonly((self.freqs >= target_hz - band) & (self.freqs <= target_hz + band))
+        self.band_index = _readonly(np.flatnonzero(self.band_mask))
+        self.reference_wave = _readonly(
+            BreathClock().target_wave(length, breaths_per_min=breaths_per_min, fps=fps))
+
+
+class SpectralPlanCache:
+    """
+    Ограниченный LRU-кэш планов со счётчиками попаданий/промахов.
+    Потокобезопасен (Streamlit обслуживает сессии из разных потоков).
+    """
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, length, fps=1.0, target_hz=0.1, band=0.03, breaths_per_min=6.0):
+        key = (int(length), float(fps), float(target_hz), float(band), float(breaths_per_min))
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+            self.misses += 1
+        plan = SpectralPlan(*key)
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+        return plan
+
+    def info(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._plans),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Общий кэш процесса
+plan_cache = SpectralPlanCache()
+
+
+def get_plan(length, fps=1.0, target_hz=0.1, band=0.03, breaths_per_min=6.0):
+    """Возвращает (кэшированный) план для окна длины length."""
+    return plan_cache.get(length, fps=fps, target_hz=target_hz, band=band, breaths_per_min=breaths_per_min)
@@ -0,0 +1,246 @@
+# planet_pattern/sweep.py
+"""
+Параллельный перебор параметров симуляции.
+
+Пространство параметров — словарь {имя: значения}:
+    список / кортеж значений        → сетка (grid) или случайный выбор (random)
+    ('uniform', lo, hi)             → равномерно на [lo, hi] (только random)
+    ('loguniform', lo, hi)          → лог-равномерно (только random)
+Поддерживаемые имена: alpha, lr, sleep_every, breaths_per_min, target
+(плюс любые поля SimulationConfig).
+
+Каждый прогон получает детерминированный seed: дочерняя SeedSequence
+(base_seed, spawn_key=(run_id,)) — результат не зависит ни от числа воркеров,
+ни от порядка завершения. Прогоны режутся на пакеты по batch_size; пакет
+выполняется в ProcessPoolExecutor и целиком пишется колоночным чанком
+chunk_XXXXXX.npz (атомарно: tmp + os.replace). После прерывания готовые
+чанки пропускаются — перебор продолжается с места остановки.
+"""
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from agent import FixedAgent, PlanetAgent
+from simulation import Simulation, SimulationConfig
+
+
+MANIFEST = 'sweep.json'
+METRICS = (
+    'final_alpha', 'coherence_mean', 'coherence_std', 'coherence_last',
+    'A_mean', 'R_mean', 'L_mean', 'S_mean', 'E_mean', 'E_last',
+    'fixed_coherence_mean', 'fixed_E_mean',
+)
+
+
+def grid(space):
+    """Полная сетка: список словарей параметров в детерминированном порядке."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_search(space, n, seed=0):
+    """n случайных точек пространства (seeded)."""
+    rng = np.random.default_rng(seed)
+    points = []
+    for _ in range(n):
+        point = {}
+        for name, spec in space.items():
+            if isinstance(spec, tuple) and spec and spec[0] in ('uniform', 'loguniform'):
+                kind, lo, hi = spec
+                point[name] = float(rng.uniform(lo, hi) if kind == 'uniform'
+                                    else np.exp(rng.uniform(np.log(lo), np.log(hi))))
+            else:
+                value = spec[rng.integers(len(spec))]
+                point[name] = value.item() if isinstance(value, np.generic) else value
+        points.append(point)
+    return points
+
+
+def run_seed(base_seed, run_id):
+    return np.random.SeedSequence(base_seed, spawn_key=(run_id,))
+
+
+def build_simulation(params, seed, base=None):
+    """Симуляция «живой + фиксированный» (как в run_demo_v2.py) для точки params."""
+    settings = dict(base or {})
+    settings.update({k: v for k, v in params.items() if k not in ('alpha', 'lr', 'target')})
+    if 'target' in params:
+        settings['learn_target'] = params['target']
+    if 'breaths_per_min' in params and 'target_hz' not in params:
+        settings['target_hz'] = params['breaths_per_min'] / 60.0
+    settings['seed'] = seed
+    alpha = params.get('alpha', 0.5)
+    agents = [PlanetAgent("GaiaLink", alpha=alpha, lr=params.get('lr', 0.1)),
+              FixedAgent("Mechanic", alpha=alpha)]
+    return Simulation(SimulationConfig(**settings), agents)
+
+
+def summarize(sim):
+    """Сводные метрики прогона (по живому агенту + контроль по фиксированному)."""
+    coherence = sim.coherence[:sim.n_checks]
+    out = {
+        'final_alpha': sim.agents[0].alpha,
+        'coherence_mean': coherence[:, 0].mean() if len(coherence) else np.nan,
+        'coherence_std': coherence[:, 0].std() if len(coherence) else np.nan,
+        'coherence_last': coherence[-1, 0] if len(coherence) else np.nan,
+        'fixed_coherence_mean': coherence[:, 1].mean() if len(coherence) else np.nan,
+    }
+    energy = sim.energy[:sim.n_checks]
+    for key in 'ARLSE':
+        out[f'{key}_mean'] = energy[key][:, 0].mean() if len(energy) else np.nan
+    out['E_last'] = energy['E'][-1, 0] if len(energy) else np.nan
+    out['fixed_E_mean'] = energy['E'][:, 1].mean() if len(energy) else np.nan
+    return out
+
+
+def run_batch(run_ids, points, base_seed, base):
+    """Выполняется в воркере: пакет прогонов → колонки."""
+    rows = []
+    for run_id, params in zip(run_ids, points):
+        sim = build_simulation(params, run_seed(base_seed, run_id), base).run()
+        rows.append(summarize(sim))
+    columns = {'run_id': np.asarray(run_ids, dtype=np.int64)}
+    for name in METRICS:
+        columns[name] = np.array([row[name] for row in rows], dtype=float)
+    for name in points[0]:
+        columns[f'param_{name}'] = np.array([p[name] for p in points])
+    return columns
+
+
+class Sweep:
+    """
+    path — каталог результатов; points — список словарей параметров (grid / random_search);
+    base — общие поля SimulationConfig (по умолчанию compute_energy=True и т. п.).
+    """
+    def __init__(self, path, points, base_seed=0, base=None, batch_size=16):
+        self.path = path
+        self.points = list(points)
+        self.base_seed = int(base_seed)
+        self.base = dict(base or {})
+        self.batch_size = int(batch_size)
+        os.makedirs(path, exist_ok=True)
+        spec = {
+            'version': 1,
+            'base_seed': self.base_seed,
+            'base': self.base,
+            'batch_size': self.batch_size,
+            'points': self.points,
+        }
+        manifest = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest):
+            with open(manifest, encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored != json.loads(json.dumps(spec)):
+                raise ValueError(f"Sweep: в {path} уже лежит другой перебор — укажите новый каталог")
+        else:
+            tmp = manifest + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(spec, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, manifest)
+
+    @property
+    def n_batches(self):
+        return -(-len(self.points) // self.batch_size)
+
+    def _chunk(self, b):
+        return os.path.join(self.path, f"chunk_{b:06d}.npz")
+
+    def pending(self):
+        """Номера пакетов, для которых ещё нет чанка на диске."""
+        return [b for b in range(self.n_batches) if not os.path.exists(self._chunk(b))]
+
+    def _write(self, b, columns):
+        tmp = self._chunk(b) + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **columns)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._chunk(b))
+
+    def run(self, workers=None, progress=None):
+        """
+        Выполняет недостающие пакеты; workers=1 — без пула процессов (отладка).
+        progress(done, total) вызывается после каждого записанного чанка.
+        """
+        todo = self.pending()
+        total, done = self.n_batches, self.n_batches - len(todo)
+        tasks = {}
+        for b in todo:
+            lo = b * self.batch_size
+            ids = list(range(lo, min(lo + self.batch_size, len(self.points))))
+            tasks[b] = (ids, [self.points[i] for i in ids], self.base_seed, self.base)
+        if workers == 1:
+            for b, args in tasks.items():
+                self._write(b, run_batch(*args))
+                done += 1
+                if progress:
+                    progress(done, total)
+            return self
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_batch, *args): b for b, args in tasks.items()}
+            for future in as_completed(futures):
+                self._write(futures[future], future.result())
+                done += 1
+                if progress:
+                    progress(done, total)
+        return self
+
+    def load(self):
+        """Все готовые результаты: словарь колонок, строки упорядочены по run_id."""
+        chunks = []
+        for b in range(self.n_batches):
+            if os.path.exists(self._chunk(b)):
+                with np.load(self._chunk(b)) as chunk:
+                    chunks.append(dict(chunk))
+        if not chunks:
+            return {}
+        columns = {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]}
+        order = np.argsort(columns['run_id'], kind='stable')
+        return {name: col[order] for name, col in columns.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перебор параметров Planet Pattern")
+    parser.add_argument('path', help="каталог результатов (повторный запуск продолжает перебор)")
+    parser.add_argument('--random', type=int, default=0, help="число случайных точек вместо сетки")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--cycles', type=int, default=200)
+    args = parser.parse_args()
+
+    space = {
+        'alpha': [0.3, 0.5, 0.7],
+        'lr': [0.05, 0.1, 0.2],
+        'sleep_every': [20, 40, 80],
+        'breaths_per_min': [5.0, 6.0, 7.5],
+        'target': [40.0, 50.0, 60.0],
+    }
+    if args.random:
+        space = {
+            'alpha': ('uniform', 0.1, 1.0),
+            'lr': ('loguniform', 0.01, 0.3),
+            'sleep_every': [20, 40, 80],
+            'breaths_per_min': ('uniform', 4.0, 12.0),
+            'target': ('uniform', 30.0, 70.0),
+        }
+        points = random_search(space, args.random, seed=args.seed)
+    else:
+        points = grid(space)
+
+    sweep = Sweep(args.path, points, base_seed=args.seed, base={'n_cycles': args.cycles},
+                  batch_size=args.batch_size)
+    sweep.run(workers=args.workers, progress=lambda d, n: print(f"\r{d}/{n} пакетов", end='', flush=True))
+    print()
+    res = sweep.load()
+    best = int(np.nanargmax(res['coherence_mean']))
+    print(f"Лучшая точка (coherence_mean={res['coherence_mean'][best]:.1f}):",
+          {name[6:]: res[name][best].item() for name in res if name.startswith('param_')})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# planet_pattern/tests/conftest.py
+# Модули проекта лежат плоско в корне репозитория и импортируются по имени (from agent import ...)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,75 @@
+# planet_pattern/tests/test_agent.py
+import time
+import tracemalloc
+
+import numpy as np
+
+from agent import AgentPopulation, FixedAgent, PlanetAgent
+from rhythm import BreathClock
+
+
+def _agents(seed=0):
+    agents = [PlanetAgent(f"a{i}", alpha=0.2 + 0.1 * i, lr=0.05 * (i + 1), seed=seed + i) for i in range(5)]
+    return agents + [FixedAgent("fixed", alpha=0.5, seed=seed + 99)]
+
+
+def test_population_matches_scalar_agents():
+    clock = BreathClock()
+    scalar, population = _agents(), AgentPopulation.from_agents(_agents(), block=7)
+    rng = np.random.default_rng(0)
+    for t in range(100):
+        _, progress = clock.phase_at(t)
+        expected = [agent.act(None, progress) for agent in scalar]
+        np.testing.assert_array_equal(population.act(None, progress), expected)
+        if t % 8 == 0:
+            scores = rng.uniform(0, 100, len(scalar))
+            for agent, score in zip(scalar, scores):
+                agent.learn(score, target=50.0)
+            population.learn(scores, target=50.0)
+            np.testing.assert_array_equal(population.alpha, [agent.alpha for agent in scalar])
+
+
+def test_to_agents_continues_noise():
+    population = AgentPopulation.from_agents(_agents(), block=16)
+    for _ in range(5):
+        population.act(None, 0.25)
+    agents = population.to_agents()
+    np.testing.assert_array_equal(population.act(None, 0.25), [a.act(None, 0.25) for a in agents])
+
+
+def test_lane_noise_independent_of_block():
+    a = AgentPopulation(3000, seed=1, block=5, lane=1024)
+    b = AgentPopulation(3000, seed=1, block=64, lane=1024)
+    for _ in range(20):
+        np.testing.assert_array_equal(a.act(None, 0.1), b.act(None, 0.1))
+
+
+def test_noise_state_round_trip():
+    a = AgentPopulation(2500, seed=2, block=8)
+    for _ in range(11):
+        a.act(None, 0.3)
+    b = AgentPopulation(2500, seed=2, block=8)
+    b.set_noise_state(a.noise_state())
+    for _ in range(20):
+        np.testing.assert_array_equal(a.act(None, 0.3), b.act(None, 0.3))
+
+
+def test_large_population_smoke():
+    n = 1_000_000
+    tracemalloc.start()
+    try:
+        t0 = time.perf_counter()
+        population = AgentPopulation(n, seed=0)
+        out = np.empty(n)
+        for t in range(4):
+            population.act(None, t / 4, out=out)
+        population.learn(out * 100.0, target=50.0)
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert np.isfinite(out).all()
+    assert ((population.alpha >= 0.1) & (population.alpha <= 1.0)).all()
+    # шум — ~2·max_noise_elems чисел, а не буфер на каждого агента
+    assert peak < 256 * 2 ** 20
+    assert elapsed < 30.0
@@ -0,0 +1,27 @@
+# planet_pattern/tests/test_benchmark.py
+import json
+
+import benchmark
+
+
+def test_committed_baseline_covers_full_grid():
+    with open(benchmark.DEFAULT_BASELINE, encoding='utf-8') as f:
+        baseline = json.load(f)
+    keys = {row['key'] for row in baseline['results']}
+    for name, (_, full, small) in benchmark.CASES.items():
+        for params in full + small:
+            assert benchmark.case_key(name, params) in keys
+
+
+def test_missing_baseline_fails_loudly(tmp_path):
+    assert benchmark.main(['--baseline', str(tmp_path / 'missing.json'), '--out', str(tmp_path / 'out.json')]) == 2
+    assert not (tmp_path / 'out.json').exists()
+
+
+def test_compare_statuses():
+    baseline = {'results': [{'key': 'a', 'median_s': 1.0}, {'key': 'b', 'median_s': 1.0},
+                            {'key': 'c', 'median_s': 1.0}]}
+    current = {'results': [{'key': 'a', 'median_s': 1.5}, {'key': 'b', 'median_s': 0.5},
+                           {'key': 'c', 'median_s': 1.1}, {'key': 'd', 'median_s': 1.0}]}
+    status = {row['key']: row['status'] for row in benchmark.compare(current, baseline, threshold=0.2)}
+    assert status == {'a': 'regression', 'b': 'improved', 'c': 'ok', 'd': 'new'}
@@ -0,0 +1,33 @@
+# planet_pattern/tests/test_decimation.py
+import numpy as np
+import pytest
+
+from decimation import MinMaxPyramid
+
+
+@pytest.mark.parametrize("factor", [2, 4])
+@pytest.mark.parametrize("with_x", [False, True])
+def test_update_matches_rebuild(factor, with_x):
+    rng = np.random.default_rng(factor)
+    y = rng.standard_normal(5000)
+    y[rng.random(len(y)) < 0.02] = np.nan
+    x = np.cumsum(rng.random(len(y))) if with_x else None
+    grown = MinMaxPyramid(y[:1], None if x is None else x[:1], factor=factor)
+    for stop in (3, 17, 1000, 1001, 4096, 5000):
+        grown.update(y[:stop], None if x is None else x[:stop])
+    full = MinMaxPyramid(y, x, factor=factor)
+    assert len(grown.levels) == len(full.levels)
+    for (lo, hi), (lo_ref, hi_ref) in zip(grown.levels, full.levels):
+        np.testing.assert_array_equal(lo, lo_ref)
+        np.testing.assert_array_equal(hi, hi_ref)
+    for x0, x1, max_points in ((None, None, 300), (100, 2500, 64), (10, 20, 2000)):
+        for a, b in zip(grown.view(x0, x1, max_points), full.view(x0, x1, max_points)):
+            np.testing.assert_array_equal(a, b)
+
+
+def test_view_keeps_extremes():
+    y = np.zeros(100_000)
+    y[12345], y[67890] = 5.0, -5.0
+    _, values = MinMaxPyramid(y).view(max_points=200)
+    assert len(values) <= 200
+    assert values.max() == 5.0 and values.min() == -5.0
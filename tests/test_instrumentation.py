@@ -0,0 +1,32 @@
+# planet_pattern/tests/test_instrumentation.py
+import gc
+
+from agent import PlanetAgent
+from instrumentation import Instrumentation, metrics
+from simulation import Simulation, SimulationConfig
+
+
+def test_prometheus_non_finite_gauges():
+    registry = Instrumentation(enabled=True)
+    registry.gauge('a', float('nan'))
+    registry.gauge('b', float('inf'))
+    registry.gauge('c', lambda: -float('inf'))
+    registry.gauge('d', 1.5)
+    lines = registry.to_prometheus(prefix='p').splitlines()
+    assert 'p_a NaN' in lines
+    assert 'p_b +Inf' in lines
+    assert 'p_c -Inf' in lines
+    assert 'p_d 1.5' in lines
+
+
+def test_gauges_do_not_keep_simulation_alive():
+    metrics.enable()
+    try:
+        sim = Simulation(SimulationConfig(n_cycles=64, seed=0), [PlanetAgent("a")]).run()
+        assert metrics.to_dict()['gauges']['memory.windows'] == len(sim.memories[0])
+        del sim
+        gc.collect()
+        assert metrics.to_prometheus().count('planet_pattern_memory_windows NaN') == 1
+    finally:
+        metrics.disable()
+        metrics.reset()
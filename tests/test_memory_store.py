@@ -0,0 +1,88 @@
+# planet_pattern/tests/test_memory_store.py
+import os
+
+import numpy as np
+import pytest
+
+from memory_store import WaveletStore
+from wave_memory import WaveletMemory
+
+
+def test_round_trip_across_segments(tmp_path):
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((10, 6))
+    store = WaveletStore(str(tmp_path), coeff_len=6, segment_windows=4)
+    store.append(data[:3], t=np.arange(3), phase=1, agent=2)
+    store.append(data[3:], t=np.arange(3, 10), phase=1, agent=2)
+    assert [seg['count'] for seg in store.segments] == [4, 4, 2]
+
+    reopened = WaveletStore(str(tmp_path), readonly=True)
+    np.testing.assert_array_equal(reopened.coefficients(), data)
+    np.testing.assert_array_equal(reopened.coefficients(2, 7), data[2:7])
+    np.testing.assert_array_equal(reopened.take([9, 0, 5]), data[[9, 0, 5]])
+    np.testing.assert_array_equal(reopened.metadata()['t'], np.arange(10))
+
+
+def test_uncommitted_tail_is_dropped(tmp_path):
+    store = WaveletStore(str(tmp_path), coeff_len=4)
+    store.append(np.ones((3, 4)))
+    # запись прервалась до фиксации манифеста
+    with open(store._file(store.segments[-1]['name'], 'coeffs'), 'ab') as f:
+        f.write(np.zeros((2, 4)).tobytes())
+    reopened = WaveletStore(str(tmp_path))
+    assert len(reopened) == 3
+    np.testing.assert_array_equal(reopened.coefficients(), np.ones((3, 4)))
+
+
+def test_failed_commit_rolls_back(tmp_path, monkeypatch):
+    store = WaveletStore(str(tmp_path), coeff_len=4, segment_windows=3)
+    store.append(np.ones((5, 4)))
+
+    def fail():
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, '_commit', fail)
+    with pytest.raises(OSError):
+        store.append(np.zeros((4, 4)))
+    with pytest.raises(OSError):
+        store.compact(2)
+    monkeypatch.undo()
+    assert [seg['count'] for seg in store.segments] == [3, 2]
+    assert store.first_id == 0
+    assert sorted(os.listdir(tmp_path)) == ['manifest.json', 'seg_000000.coeffs', 'seg_000000.meta',
+                                            'seg_000001.coeffs', 'seg_000001.meta']
+    store.append(np.full((1, 4), 2.0))
+    np.testing.assert_array_equal(WaveletStore(str(tmp_path)).coefficients()[:, 0], [1, 1, 1, 1, 1, 2])
+
+
+def test_compact_keeps_tail(tmp_path):
+    data = np.arange(40, dtype=float).reshape(10, 4)
+    store = WaveletStore(str(tmp_path), coeff_len=4, segment_windows=3)
+    for row in data:
+        store.append(row, t=int(row[0]))
+    old = [seg['name'] for seg in store.segments]
+    assert store.compact(4) == 4
+    np.testing.assert_array_equal(store.coefficients(), data[-4:])
+    np.testing.assert_array_equal(WaveletStore(str(tmp_path)).metadata()['t'], data[-4:, 0])
+    assert not any(name in store._maps for name in old)
+    assert not any(f.startswith(tuple(old)) for f in os.listdir(tmp_path))
+    for s in (store, WaveletStore(str(tmp_path))):
+        assert s.total_pushed == 10
+        np.testing.assert_array_equal(s.storage_ids(), np.arange(6, 10))
+    store.append(np.zeros(4))
+    np.testing.assert_array_equal(WaveletStore(str(tmp_path)).storage_ids(), np.arange(6, 11))
+
+
+def test_memory_ids_survive_compaction(tmp_path):
+    rng = np.random.default_rng(0)
+    memory = WaveletMemory(storage='disk', path=str(tmp_path))
+    for t in range(12):
+        memory.push_series(rng.standard_normal(32), meta={'t': t})
+    memory.compact(5)
+    reopened = WaveletMemory(storage='disk', path=str(tmp_path))
+    for m in (memory, reopened):
+        assert m.total_pushed == 12
+        np.testing.assert_array_equal(m.storage_ids(), np.arange(7, 12))
+        np.testing.assert_array_equal(m.metadata()['t'], np.arange(7, 12))
+    hit = reopened.query(reopened.coefficients()[2], k=1)
+    assert hit['id'][0] == 9 and hit['t'][0] == 9
@@ -0,0 +1,43 @@
+# planet_pattern/tests/test_resonance.py
+import numpy as np
+import pytest
+
+from resonance import StreamingCoherence, coherence_score, coherence_scores
+
+
+@pytest.mark.parametrize("window", [16, 31, 32, 64])
+def test_sliding_dft_matches_coherence_score(window):
+    rng = np.random.default_rng(window)
+    t = np.arange(600)
+    x = np.sin(2 * np.pi * 0.1 * t) + 0.5 * rng.standard_normal(len(t))
+    sc = StreamingCoherence(window=window, resync_every=128)
+    scores = sc.extend(x)
+    ref = [coherence_score(x[i - window + 1:i + 1]) for i in range(window - 1, len(x))]
+    np.testing.assert_allclose(scores[window - 1:], ref, rtol=1e-7, atol=1e-7)
+    assert sc.ready
+
+
+def test_update_and_extend_agree():
+    x = np.random.default_rng(1).standard_normal(200)
+    a, b = StreamingCoherence(window=32), StreamingCoherence(window=32)
+    np.testing.assert_array_equal([a.update(v) for v in x], b.extend(x))
+
+
+def test_batched_scores_match_scalar():
+    rng = np.random.default_rng(2)
+    windows = rng.standard_normal((50, 32))
+    windows[3] = 1.0      # плоское окно → 0
+    ref = [coherence_score(w) for w in windows]
+    np.testing.assert_allclose(coherence_scores(windows), ref, rtol=1e-12, atol=1e-12)
+
+
+def test_strided_scores_match_windows():
+    x = np.random.default_rng(3).standard_normal(300)
+    ref = [coherence_score(x[i:i + 32]) for i in range(0, len(x) - 31, 5)]
+    np.testing.assert_allclose(coherence_scores(x, window=32, hop=5), ref, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("hop", [0, -1])
+def test_bad_hop_rejected(hop):
+    with pytest.raises(ValueError):
+        coherence_scores(np.zeros(64), window=32, hop=hop)
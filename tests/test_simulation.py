@@ -0,0 +1,104 @@
+# planet_pattern/tests/test_simulation.py
+import numpy as np
+import pytest
+
+from agent import FixedAgent, PlanetAgent
+from physics import calculate_energy
+from resonance import coherence_score
+from rhythm import BreathClock
+from simulation import Simulation, SimulationConfig
+from sleep_cycle import consolidate
+from wave_memory import WaveletMemory
+
+
+def _agents():
+    return [PlanetAgent("GaiaLink", alpha=0.5, lr=0.1), FixedAgent("Mechanic", alpha=0.5)]
+
+
+def scalar_loop(cfg, agents):
+    """Поэлементный цикл run_demo_v2.py (до Simulation) на тех же потоках шума и памяти."""
+    clock = BreathClock()
+    memories = [WaveletMemory(window_size=cfg.window, wavelet='db2', max_windows=cfg.memory_max_windows,
+                              storage='ring', n_clusters=cfg.memory_clusters) for _ in agents]
+    target_wave = clock.target_wave(cfg.n_cycles, breaths_per_min=cfg.breaths_per_min, fps=cfg.fps)
+    signals = [[] for _ in agents]
+    coherence, energy, sleep_t = [], [], []
+    for t in range(cfg.n_cycles):
+        phase, prog = clock.phase_at(t)
+        for j, agent in enumerate(agents):
+            signals[j].append(agent.act(phase, prog, noise_scale=cfg.noise_scale))
+        full = len(signals[0]) >= cfg.window
+        if full and t % cfg.coherence_every == 0:
+            scores, row = [], []
+            for j, agent in enumerate(agents):
+                window = np.array(signals[j][-cfg.window:])
+                scores.append(coherence_score(window, fps=cfg.fps, target_hz=cfg.target_hz, band=cfg.band))
+                agent.learn(scores[-1], target=cfg.learn_target)
+                row.append(calculate_energy(window, reference_wave=target_wave[max(0, t - cfg.window + 1):t + 1],
+                                            fps=cfg.fps))
+            coherence.append(scores)
+            energy.append(row)
+        if full and t % cfg.memory_every == 0:
+            for j, (agent, memory) in enumerate(zip(agents, memories)):
+                memory.push_series(np.array(signals[j][-cfg.window:]), meta={'t': t, 'phase': phase, 'agent': agent.name})
+        if (t + 1) % cfg.sleep_every == 0:
+            lo, hi = cfg.sleep_alpha_bounds
+            for agent, memory in zip(agents, memories):
+                core = consolidate(memory.retrieve_centroids(k=cfg.centroids_k)) if agent.adaptive else None
+                if core is not None:
+                    drift = float(np.mean(np.abs(core)))
+                    agent.alpha = float(np.clip(agent.alpha * (1.0 + 0.05*drift), lo, hi))
+            sleep_t.append(t + 1)
+    return np.array(signals).T, np.array(coherence), energy, sleep_t
+
+
+@pytest.mark.parametrize("n_cycles", [7, 200, 333])
+def test_simulation_matches_scalar_loop(n_cycles):
+    cfg = SimulationConfig(n_cycles=n_cycles, seed=11)
+    sim = Simulation(cfg, _agents()).run()
+    # те же потоки шума: Simulation пересевает агентов из cfg.seed
+    reference = Simulation(cfg, _agents()).agents
+    signals, coherence, energy, sleep_t = scalar_loop(cfg, reference)
+
+    np.testing.assert_array_equal(sim.signals, signals)
+    np.testing.assert_array_equal(sim.coherence[:sim.n_checks].reshape(coherence.shape), coherence)
+    assert sim.sleep_t == sleep_t
+    assert [a.alpha for a in sim.agents] == [a.alpha for a in reference]
+    for i, row in enumerate(energy):
+        for j, e in enumerate(row):
+            for key in 'ARLSE':
+                assert sim.energy[key][i, j] == pytest.approx(e[key], rel=1e-12, abs=1e-12)
+
+
+def test_chunked_advance_matches_run():
+    cfg = SimulationConfig(n_cycles=500, seed=4)
+    whole = Simulation(cfg, _agents()).run()
+    chunked = Simulation(cfg, _agents())
+    while not chunked.done:
+        chunked.advance(37)
+    np.testing.assert_array_equal(whole.signals, chunked.signals)
+    np.testing.assert_array_equal(whole.coherence, chunked.coherence)
+    np.testing.assert_array_equal(whole.energy, chunked.energy)
+
+
+@pytest.mark.parametrize("decay", [None, 0.1])
+def test_streaming_consolidation_core(decay):
+    cfg = SimulationConfig(n_cycles=400, seed=2, consolidation='streaming', consolidation_decay=decay)
+    cores = []
+    sim = Simulation(cfg, _agents())
+    sim.add_hook('sleep', lambda sim, t, payload: cores.append((payload[0], sim.memories[0].coefficients())))
+    sim.run()
+    assert len(cores) == len(sim.sleep_t) and sim.memories[0].kmeans is None
+    for core, coeffs in cores:
+        if not len(coeffs):
+            assert core is None
+            continue
+        # все окна памяти (без вытеснения) — то же ядро, что у consolidate по всем окнам
+        w = (1.0 - (decay or 0.0)) ** np.arange(len(coeffs) - 1, -1, -1)
+        expected = consolidate(list(w[:, None] * coeffs * len(w) / w.sum()))
+        np.testing.assert_allclose(core, expected, rtol=1e-9, atol=1e-12)
+
+
+def test_unknown_consolidation_rejected():
+    with pytest.raises(ValueError):
+        Simulation(SimulationConfig(consolidation='median'), _agents())
@@ -0,0 +1,102 @@
+# planet_pattern/tests/test_simulation_jobs.py
+import threading
+import time
+
+import pytest
+
+from simulation import SimulationConfig
+from simulation_jobs import JobRegistry
+
+
+class SlowSim:
+    """Заглушка Simulation: n_cycles шагов, каждый advance чуть ждёт."""
+    def __init__(self, n_cycles=40, delay=0.002):
+        self.config = SimulationConfig(n_cycles=n_cycles)
+        self.delay = delay
+        self.t = 0
+        self.n_checks = 0
+        self.sleep_t = []
+
+    @property
+    def done(self):
+        return self.t >= self.config.n_cycles
+
+    def advance(self, n):
+        time.sleep(self.delay)
+        self.t = min(self.config.n_cycles, self.t + n)
+        return self
+
+
+class Builds:
+    def __init__(self):
+        self.count = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, key, **kwargs):
+        def build():
+            with self._lock:
+                self.count[key] = self.count.get(key, 0) + 1
+            return SlowSim(**kwargs)
+        return build
+
+
+def test_round_robin_viewers_all_finish():
+    registry = JobRegistry(max_running=2, chunk_steps=1)
+    builds = Builds()
+    keys = list(range(registry.max_running + 1))
+    deadline = time.time() + 30
+    jobs = {}
+    while time.time() < deadline:
+        for key in keys:
+            jobs[key] = registry.get_or_start(key, builds(key))
+            assert registry.info()['running'] <= registry.max_running
+        if all(job.done for job in jobs.values()):
+            break
+        time.sleep(0.001)
+    assert [jobs[key].status for key in keys] == ['done'] * len(keys)
+    assert builds.count == {key: 1 for key in keys}
+
+
+def test_queued_job_starts_without_polling():
+    registry = JobRegistry(max_running=1, chunk_steps=1)
+    builds = Builds()
+    first = registry.get_or_start('a', builds('a', n_cycles=5))
+    second = registry.get_or_start('b', builds('b', n_cycles=5))
+    assert second.status == 'pending'
+    assert first.wait(10) and second.wait(10)
+    assert second.status == 'done'
+
+
+def test_cancelled_job_restarts_only_on_request():
+    registry = JobRegistry(chunk_steps=1)
+    builds = Builds()
+    job = registry.get_or_start('a', builds('a', n_cycles=10 ** 6))
+    job.cancel()
+    assert job.wait(10) and job.status == 'cancelled'
+    assert registry.get_or_start('a', builds('a')) is job
+    again = registry.get_or_start('a', builds('a', n_cycles=3), restart=True)
+    assert again is not job and again.wait(10) and again.status == 'done'
+    assert builds.count['a'] == 2
+
+
+def test_abandoned_jobs_expire():
+    registry = JobRegistry(max_running=1, chunk_steps=1, idle_ttl=0.05)
+    builds = Builds()
+    running = registry.get_or_start('a', builds('a', n_cycles=10 ** 6))
+    queued = registry.get_or_start('b', builds('b', n_cycles=10 ** 6))
+    time.sleep(0.1)
+    fresh = registry.get_or_start('c', builds('c', n_cycles=3))
+    assert running.wait(10) and running.status == 'cancelled'
+    assert queued.status == 'cancelled'
+    assert fresh.wait(10) and fresh.status == 'done'
+    assert len(registry) == 1
+
+
+def test_full_queue_is_refused():
+    registry = JobRegistry(max_running=1, max_pending=1, chunk_steps=1)
+    builds = Builds()
+    blocker = registry.get_or_start('a', builds('a', n_cycles=10 ** 6))
+    registry.get_or_start('b', builds('b'))
+    with pytest.raises(RuntimeError):
+        registry.get_or_start('c', builds('c'))
+    blocker.cancel()
@@ -0,0 +1,52 @@
+# planet_pattern/tests/test_sleep_cycle.py
+import numpy as np
+import pytest
+
+from sleep_cycle import LowRankConsolidator, StreamingConsolidator, consolidate
+
+
+def test_welford_matches_consolidate():
+    X = np.random.default_rng(0).standard_normal((300, 39)) + 0.3
+    streaming = StreamingConsolidator()
+    for chunk in np.array_split(X, 7):
+        streaming.update(chunk)
+    np.testing.assert_allclose(streaming.core(), consolidate(list(X)), rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(streaming.variance, X.var(axis=0), rtol=1e-10)
+
+
+def test_merge_and_state_round_trip():
+    X = np.random.default_rng(1).standard_normal((100, 8))
+    whole = StreamingConsolidator().update(X)
+    left, right = StreamingConsolidator().update(X[:37]), StreamingConsolidator().update(X[37:])
+    merged = StreamingConsolidator.from_state(left.state()).merge(right)
+    assert merged.count == whole.count
+    np.testing.assert_allclose(merged.mean, whole.mean, rtol=1e-12)
+    np.testing.assert_allclose(merged.m2, whole.m2, rtol=1e-10)
+
+
+def test_empty_consolidators():
+    assert consolidate([]) is None
+    assert StreamingConsolidator().core() is None
+
+
+def test_low_rank_requires_basis():
+    with pytest.raises(ValueError):
+        LowRankConsolidator(rank=2).project(np.zeros((1, 4)))
+
+
+@pytest.mark.parametrize("decay", [None, 0.05])
+def test_low_rank_matches_weighted_pca(decay):
+    rng = np.random.default_rng(4)
+    X = rng.standard_normal((120, 6)) @ rng.standard_normal((6, 6)) + 2.0
+    lowrank = LowRankConsolidator(rank=6, decay=decay)
+    for chunk in np.split(X, [1, 8, 30, 31, 77]):
+        lowrank.update(chunk)
+    # точный взвешенный PCA: вес окна k — (1 - decay)^(N-1-k)
+    w = (1.0 - (decay or 0.0)) ** np.arange(len(X) - 1, -1, -1)
+    mean = w @ X / w.sum()
+    scatter = (w[:, None] * (X - mean)).T @ (X - mean)
+    eigvals, eigvecs = np.linalg.eigh(scatter)
+    eigvals, eigvecs = eigvals[::-1], eigvecs[:, ::-1]
+    np.testing.assert_allclose(lowrank.mean, mean, rtol=1e-10)
+    np.testing.assert_allclose(lowrank.singular_values ** 2, eigvals, rtol=1e-8)
+    np.testing.assert_allclose(np.abs(lowrank.basis.T @ eigvecs), np.eye(6), atol=1e-6)
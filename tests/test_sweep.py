@@ -0,0 +1,60 @@
+# planet_pattern/tests/test_sweep.py
+import numpy as np
+import pytest
+
+from halving import SuccessiveHalving
+from sweep import Sweep, grid
+
+BASE = {'n_cycles': 120, 'sleep_every': 40}
+POINTS = grid({'alpha': [0.3, 0.5, 0.7], 'lr': [0.05, 0.1, 0.2]})
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _interrupt_after(n):
+    def progress(*args):
+        progress.calls += 1
+        if progress.calls >= n:
+            raise Interrupted
+    progress.calls = 0
+    return progress
+
+
+def _assert_columns_equal(a, b):
+    assert a.keys() == b.keys()
+    for name in a:
+        np.testing.assert_array_equal(a[name], b[name])
+
+
+def test_sweep_resumes_after_interruption(tmp_path):
+    clean = Sweep(str(tmp_path / 'clean'), POINTS, base_seed=3, base=BASE, batch_size=2).run(workers=1).load()
+
+    path = str(tmp_path / 'resumed')
+    with pytest.raises(Interrupted):
+        Sweep(path, POINTS, base_seed=3, base=BASE, batch_size=2).run(workers=1, progress=_interrupt_after(2))
+    sweep = Sweep(path, POINTS, base_seed=3, base=BASE, batch_size=2)
+    assert sweep.pending() == [2, 3, 4]
+    _assert_columns_equal(sweep.run(workers=1).load(), clean)
+    assert sweep.pending() == []
+
+
+def test_sweep_rejects_other_spec(tmp_path):
+    Sweep(str(tmp_path), POINTS, base_seed=0, base=BASE)
+    with pytest.raises(ValueError):
+        Sweep(str(tmp_path), POINTS, base_seed=1, base=BASE)
+
+
+def test_halving_resumes_after_interruption(tmp_path):
+    args = dict(objective='coherence_mean', eta=3, min_fraction=1 / 3, base_seed=5, base=BASE)
+    clean = SuccessiveHalving(str(tmp_path / 'clean'), POINTS, **args).run(workers=1)
+
+    path = str(tmp_path / 'resumed')
+    with pytest.raises(Interrupted):
+        SuccessiveHalving(path, POINTS, **args).run(workers=1, progress=_interrupt_after(1))
+    sh = SuccessiveHalving(path, POINTS, **args)
+    assert sh.rung(0) is not None and sh.rung(1) is None
+    resumed = sh.run(workers=1)
+    _assert_columns_equal(resumed, clean)
+    assert len(resumed['run_id']) == len(POINTS) // 3
@@ -0,0 +1,49 @@
+# planet_pattern/tests/test_wave_memory.py
+import numpy as np
+import pytest
+
+from wave_memory import WaveletMemory
+
+
+def _fill(memory, n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        memory.push_series(rng.standard_normal(memory.window_size * 2),
+                           meta={'t': i, 'phase': 'inhale', 'agent': 'a'})
+    return memory
+
+
+@pytest.mark.parametrize("max_windows", [50, 500])
+def test_ring_matches_deque(max_windows):
+    deq = _fill(WaveletMemory(max_windows=max_windows))
+    ring = _fill(WaveletMemory(max_windows=max_windows, storage='ring'))
+    assert len(deq) == len(ring)
+    np.testing.assert_array_equal(deq.coefficients(), ring.coefficients())
+    np.testing.assert_array_equal(deq.storage_ids(), np.sort(ring.storage_ids()))
+    for a, b in zip(deq.retrieve_centroids(k=8), ring.retrieve_centroids(k=8)):
+        np.testing.assert_array_equal(a, b)
+    np.testing.assert_allclose(deq.reconstruct_levels(), ring.reconstruct(ring.coefficients()), atol=1e-12)
+
+
+def test_query_same_in_every_storage(tmp_path):
+    memories = [_fill(WaveletMemory(max_windows=500)),
+                _fill(WaveletMemory(max_windows=500, storage='ring')),
+                _fill(WaveletMemory(max_windows=500, storage='disk', path=str(tmp_path)))]
+    q = np.random.default_rng(9).standard_normal(32)
+    results = [m.query(q, k=7) for m in memories]
+    results.append(memories[1].query(q, k=7, coarse_levels=1))
+    for res in results[1:]:
+        np.testing.assert_array_equal(res['id'], results[0]['id'])
+        np.testing.assert_allclose(res['distance'], results[0]['distance'], rtol=1e-9)
+        np.testing.assert_array_equal(res['t'], results[0]['t'])
+        np.testing.assert_array_equal(res['phase'], results[0]['phase'])
+
+
+def test_query_on_empty_default_memory():
+    res = WaveletMemory().query(np.zeros(32))
+    assert len(res['id']) == 0
+
+
+def test_index_is_ring_only():
+    with pytest.raises(ValueError):
+        WaveletMemory().build_index()
@@ -79,6 +79,16 @@ print(f"   Ядро опыта: {len(core)} элементов")
 print(f"   Норма: {np.linalg.norm(core):.3f}")
 print(f"   ✅ Реальное усреднение и нормализация")
 
+# 7. Проверка кодирования памяти (потери при сжатии коэффициентов)
+print("\n7. Кодирование волновой памяти (wave_memory.py):")
+from wave_memory import WaveletMemory
+windows = np.sin(2 * np.pi * 0.1 * np.arange(32 * 16)).reshape(16, 32)
+for enc in ('float64', 'float16', 'int8', 'topk'):
+    report = WaveletMemory(window_size=32, storage='ring', encoding=enc).encoding_report(windows)
+    print(f"   {enc:8s}: {report['bytes_per_window']:4d} байт/окно "
+          f"(×{report['compression']:.1f}), ошибка восстановления {report['mean_abs_error']:.6f}")
+print(f"   ✅ Потери измерены через waverec")
+
 print("\n" + "=" * 60)
 print("ИТОГ: ВСЁ РЕАЛЬНО. Нет заглушек, только вычисления.")
 print("=" * 60)